@@ -0,0 +1,110 @@
+"""On-disk cache for market data used by the strategies"""
+import os
+import pickle
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+
+class FileCache:
+    """
+    Pickle-backed file cache with mtime-based expiry.
+
+    Each key maps to one file under the cache root, so entries can be
+    inspected or removed by hand. A ttl of None means the entry never expires
+    on read, but every file older than max_age is removed by the periodic
+    sweep run from set(), so the folder does not grow without bound.
+    """
+
+    SWEEP_INTERVAL = timedelta(hours=24)
+
+    def __init__(self, root: str, max_age: timedelta = timedelta(days=31)):
+        self.root = Path(root)
+        self.max_age = max_age
+        self._last_sweep = 0.0
+
+    def _path(self, key: str) -> Path:
+        safe_key = "".join(c if c.isalnum() or c in "-_./" else "_" for c in key)
+        return self.root / f"{safe_key}.pkl"
+
+    def get(self, key: str, ttl: Optional[timedelta]) -> Optional[Any]:
+        """
+        Read a cached value
+
+        Args:
+            key: Cache key (may contain "/" to group entries in folders)
+            ttl: Maximum age of the entry, None for no expiry
+
+        Returns:
+            Cached value, or None if missing, expired or unreadable
+        """
+        path = self._path(key)
+        try:
+            if ttl is not None and time.time() - path.stat().st_mtime > ttl.total_seconds():
+                path.unlink(missing_ok=True)
+                return None
+            with path.open("rb") as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def mtime(self, key: str) -> Optional[float]:
+        """Return the modification time of an entry, or None if it does not exist"""
+        try:
+            return self._path(key).stat().st_mtime
+        except OSError:
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Write a value atomically so concurrent readers never see a partial file"""
+        path = self._path(key)
+        tmp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        self._sweep()
+
+    def _sweep(self) -> None:
+        """Remove entries (and leftover temp files) older than max_age, at most once per SWEEP_INTERVAL"""
+        now = time.time()
+        if now - self._last_sweep < self.SWEEP_INTERVAL.total_seconds():
+            return
+        self._last_sweep = now
+
+        cutoff = now - self.max_age.total_seconds()
+        for pattern in ("*.pkl", "*.tmp"):
+            for path in self.root.rglob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except OSError:
+                    pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[timedelta]) -> Any:
+        """
+        Return the cached value or compute and store it
+
+        Empty results (None, empty dict/DataFrame) are returned but not stored,
+        so a failed fetch is retried on the next call.
+        """
+        value = self.get(key, ttl)
+        if value is not None:
+            return value
+
+        value = compute()
+        if value is not None and len(value) > 0:
+            self.set(key, value)
+        return value
@@ -1,20 +1,40 @@
 """Momentum strategy interface and implementations"""
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_DOWN
+from functools import lru_cache
 from datetime import date, datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import warnings
 
 import yfinance as yf
 import pandas as pd
 import numpy as np
 import requests
-from bs4 import BeautifulSoup
+import lxml.html
+
+from app.algo._cache import FileCache
+from app.config import settings
 
 # Suppress warnings from yfinance for cleaner output
 warnings.filterwarnings("ignore", category=FutureWarning)
 
+# On-disk cache for Wikipedia constituents and Yahoo price history
+_cache = FileCache(settings.CACHE_DIR)
+CONSTITUENTS_TTL = timedelta(hours=24)
+RECENT_HISTORY_TTL = timedelta(hours=12)
+ALLOCATIONS_TTL = timedelta(hours=12)
+
+# In-process copy of the constituents, avoids re-reading the disk cache
+_constituents_memory_cache: Dict[Tuple[str, Optional[str], int], Tuple[Dict[str, str], datetime]] = {}
+
+# Shared HTTP session so Wikipedia fetches reuse pooled connections
+_http_session = requests.Session()
+_http_session.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+})
+
 
 @dataclass
 class Allocation:
@@ -72,9 +92,64 @@ def get_last_closed_month_date(reference_date: Optional[date] = None) -> datetim
 
 
 def get_index_constituents(url: str, table_id: Optional[str] = None, table_index: int = 0) -> Dict[str, str]:
+    """
+    Get index constituents, served from memory or the on-disk cache for 24h.
+    
+    Args:
+        url: Wikipedia URL to scrape
+        table_id: HTML table ID to look for
+        table_index: Table index to use as fallback
+    
+    Returns:
+        Dictionary mapping ticker symbols to company names
+    """
+    memory_key = (url, table_id, table_index)
+    now = datetime.now()
+    
+    if memory_key in _constituents_memory_cache:
+        ticker_map, timestamp = _constituents_memory_cache[memory_key]
+        if now - timestamp < CONSTITUENTS_TTL:
+            return ticker_map
+    
+    key = f"constituents/{url.rsplit('/', 1)[-1]}_{table_id}_{table_index}"
+    ticker_map = _cache.get_or_compute(
+        key,
+        lambda: _scrape_index_constituents(url, table_id, table_index),
+        CONSTITUENTS_TTL
+    )
+    
+    if ticker_map:
+        # Stamp the memory copy with the disk entry's age so it expires with it
+        written_at = _cache.mtime(key)
+        timestamp = datetime.fromtimestamp(written_at) if written_at is not None else now
+        _constituents_memory_cache[memory_key] = (ticker_map, timestamp)
+    
+    return ticker_map
+
+
+def _table_rows(table) -> List[List[str]]:
+    """
+    Extract the text of every cell of an HTML table, row by row.
+    
+    Hidden elements (e.g. the display:none sort keys Wikipedia puts in some
+    cells) are removed first, as pd.read_html does by default.
+    """
+    for node in table.xpath(".//*[contains(translate(@style, ' ', ''), 'display:none')]"):
+        node.drop_tree()
+    
+    return [
+        [cell.text_content().strip() for cell in row.xpath('./th|./td')]
+        for row in table.xpath('.//tr')
+    ]
+
+
+def _scrape_index_constituents(url: str, table_id: Optional[str] = None, table_index: int = 0) -> Dict[str, str]:
     """
     Scrape Wikipedia to get index constituents.
     
+    The page is parsed once with lxml and the table rows are read directly,
+    without going through a DataFrame.
+    
     Args:
         url: Wikipedia URL to scrape
         table_id: HTML table ID to look for
@@ -87,53 +162,60 @@ def get_index_constituents(url: str, table_id: Optional[str] = None, table_index
     NAME_COL = 'Security'
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _http_session.get(url, timeout=10)
         response.raise_for_status()
         
-        df = None
+        tree = lxml.html.fromstring(response.content)
+        table = None
         
         # Try by ID first
         if table_id:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            table = soup.find('table', {'id': table_id})
+            table = tree.get_element_by_id(table_id, None)
             
-            if table:
-                # Use StringIO to pass HTML string to pandas
-                from io import StringIO
-                df = pd.read_html(StringIO(str(table)), header=0)[0]
-            else:
+            if table is None or table.tag != 'table':
+                table = None
                 print(f"⚠️ Table with ID '{table_id}' not found, trying index {table_index}")
         
         # Fallback to index
-        if df is None:
-            all_tables = pd.read_html(response.text, header=0)
+        if table is None:
+            all_tables = tree.xpath('//table')
             
             if table_index >= len(all_tables):
                 print(f"❌ Invalid table index {table_index}. Only {len(all_tables)} tables found.")
                 return {}
             
-            df = all_tables[table_index]
+            table = all_tables[table_index]
+        
+        rows = [row for row in _table_rows(table) if row]
+        if not rows:
+            print(f"❌ Empty table in {url}")
+            return {}
+        
+        columns = rows[0]
         
         # Normalize column names
-        if 'Ticker' in df.columns:
+        if 'Ticker' in columns:
             TICKER_COL = 'Ticker'
-        if 'Security' not in df.columns and 'Company' in df.columns:
+        if 'Security' not in columns and 'Company' in columns:
             NAME_COL = 'Company'
         
-        if TICKER_COL in df.columns and NAME_COL in df.columns:
-            df[TICKER_COL] = df[TICKER_COL].astype(str).str.replace('.', '-', regex=False).str.strip()
-            df[NAME_COL] = df[NAME_COL].astype(str).str.strip()
+        if TICKER_COL in columns and NAME_COL in columns:
+            ticker_idx = columns.index(TICKER_COL)
+            name_idx = columns.index(NAME_COL)
             
-            ticker_map = df.set_index(TICKER_COL)[NAME_COL].to_dict()
-            ticker_map = {k: v for k, v in ticker_map.items() if k and v and k != 'nan'}
+            ticker_map = {}
+            for row in rows[1:]:
+                if len(row) <= max(ticker_idx, name_idx):
+                    continue
+                ticker = row[ticker_idx].replace('.', '-')
+                name = row[name_idx]
+                if ticker and name:
+                    ticker_map[ticker] = name
             
             print(f"✅ Retrieved {len(ticker_map)} tickers from {url}")
             return ticker_map
         else:
-            print(f"❌ Required columns not found. Available: {df.columns.tolist()}")
+            print(f"❌ Required columns not found. Available: {columns}")
             return {}
             
     except Exception as e:
@@ -141,32 +223,130 @@ def get_index_constituents(url: str, table_id: Optional[str] = None, table_index
         return {}
 
 
-def check_spy_market_condition() -> bool:
+def _history_ttl(end: Optional[date]) -> Optional[timedelta]:
+    """Past daily bars never change; ranges reaching today expire after 12h"""
+    if end is not None and end < date.today() - timedelta(days=1):
+        return None
+    return RECENT_HISTORY_TTL
+
+
+def download_history(tickers: List[str], start: date, end: Optional[date] = None) -> pd.DataFrame:
+    """
+    Download daily history for several tickers in a single batched request.
+    
+    Tickers already in the on-disk cache for the same range are not downloaded again.
+    
+    Args:
+        tickers: Stock symbols to download
+        start: First day of the range
+        end: Day after the last bar (exclusive), None for up to today
+    
+    Returns:
+        DataFrame with (ticker, field) MultiIndex columns
+    """
+    ttl = _history_ttl(end)
+    end_label = end.isoformat() if end else "latest"
+    frames = {}
+    missing = []
+    
+    for ticker in tickers:
+        cached = _cache.get(f"yf/{ticker}_{start.isoformat()}_{end_label}_1d", ttl)
+        if cached is not None:
+            frames[ticker] = cached
+        else:
+            missing.append(ticker)
+    
+    if missing:
+        downloaded = yf.download(
+            tickers=missing,
+            start=start.strftime('%Y-%m-%d'),
+            end=end.strftime('%Y-%m-%d') if end else None,
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=True,
+            threads=True,
+            progress=False
+        )
+        for ticker in missing:
+            frame = get_ticker_history(downloaded, ticker)
+            if not frame.empty:
+                _cache.set(f"yf/{ticker}_{start.isoformat()}_{end_label}_1d", frame)
+                frames[ticker] = frame
+    
+    if not frames:
+        return pd.DataFrame()
+    
+    return pd.concat(frames, axis=1, sort=True)
+
+
+def get_ticker_history(history: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """
+    Slice a single ticker's OHLCV frame out of a batched download.
+    
+    Args:
+        history: DataFrame returned by download_history
+        ticker: Stock symbol to extract
+    
+    Returns:
+        DataFrame with Open/High/Low/Close/Volume columns (empty if missing)
+    """
+    if history is None or history.empty:
+        return pd.DataFrame()
+    
+    if not isinstance(history.columns, pd.MultiIndex):
+        return history.copy()
+    
+    if ticker not in history.columns.get_level_values(0):
+        return pd.DataFrame()
+    
+    return history[ticker].dropna(how='all').copy()
+
+
+def coerce_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert non-numeric columns to floats, invalid values becoming NaN.
+    
+    yfinance already returns float columns, so in the common case this is
+    only a dtype check and the frame is returned untouched.
+    
+    Args:
+        df: Price DataFrame
+    
+    Returns:
+        DataFrame with numeric columns
+    """
+    non_numeric = df.select_dtypes(exclude='number').columns
+    if len(non_numeric) == 0:
+        return df
+    
+    df = df.copy()
+    df[non_numeric] = df[non_numeric].apply(pd.to_numeric, errors='coerce')
+    return df
+
+
+def check_spy_market_condition(spy_data: pd.DataFrame) -> bool:
     """
     Check if SPY is above its 220-day moving average.
     
+    Args:
+        spy_data: SPY daily history covering at least the last year
+    
     Returns:
         True if SPY close > SMA220, False otherwise
     """
     try:
         print("🔍 Checking SPY market condition...")
-        spy = yf.Ticker("SPY")
-        spy_data = spy.history(period="1y", interval="1d")
         
         # Convert to float and drop invalid data
-        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-            if col in spy_data.columns:
-                spy_data[col] = pd.to_numeric(spy_data[col], errors='coerce')
-        spy_data.dropna(subset=['Close'], inplace=True)
+        closes = coerce_numeric(spy_data)['Close'].to_numpy(dtype=float)
+        closes = closes[~np.isnan(closes)]
         
-        if len(spy_data) < 220:
+        if len(closes) < 220:
             print("⚠️ Insufficient SPY data for 220-day SMA")
             return False
         
-        spy_data['SMA_220'] = spy_data['Close'].rolling(window=220).mean()
-        
-        current_close = spy_data['Close'].iloc[-1]
-        sma_220 = spy_data['SMA_220'].iloc[-1]
+        current_close = closes[-1]
+        sma_220 = closes[-220:].mean()
         
         if current_close > sma_220:
             print(f"✅ SPY ({current_close:.2f}) > SMA220 ({sma_220:.2f})")
@@ -180,85 +360,164 @@ def check_spy_market_condition() -> bool:
         return False
 
 
-def calculate_wilder_atr(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+def _pack_valid(values: np.ndarray) -> np.ndarray:
+    """
+    Move each column's NaNs to the top, keeping the order of the other rows.
+    
+    Every ticker's valid values end up contiguous at the bottom of its column,
+    as a per-ticker dropna() would leave them, so tail slices line up.
+    """
+    order = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0)
+
+
+def filter_above_sma_220(history: pd.DataFrame, tickers: List[str]) -> List[str]:
+    """
+    Keep the tickers whose last close is above their 220-day moving average.
+    
+    The SMA is computed for all tickers at once on a (dates x tickers) closes
+    matrix. Tickers with fewer than 220 valid closes never pass.
+    
+    Args:
+        history: Batched daily history from download_history
+        tickers: Tickers of the history to filter
+    
+    Returns:
+        List of tickers passing the filter
+    """
+    if history.empty:
+        return []
+    
+    closes = coerce_numeric(history.xs('Close', level=1, axis=1).reindex(columns=tickers))
+    
+    if len(closes) < 220:
+        return []
+    
+    values = _pack_valid(closes.to_numpy(dtype=float))
+    
+    # Only the latest SMA is needed, so average the last 220 rows instead of
+    # materializing the full rolling series
+    sma_220 = values[-220:].mean(axis=0)
+    passed = values[-1] > sma_220
+    return closes.columns[passed].tolist()
+
+
+def calculate_wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
     """
     Calculate Wilder's Average True Range (ATR).
     
+    Matches pandas' ewm(alpha=1/period, adjust=False) over the true range.
+    2-D inputs are treated as one series per column; columns with leading
+    NaNs start smoothing at their first valid row.
+    
     Args:
-        df: DataFrame with High, Low, Close columns
+        high: High prices
+        low: Low prices
+        close: Close prices
         period: ATR period
     
     Returns:
-        DataFrame with added ATR column
+        Array of ATR values aligned with the inputs
     """
-    df_copy = df.copy()
+    prev_close = np.empty_like(close)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
     
-    df_copy.loc[:, 'high-low'] = df_copy['High'] - df_copy['Low']
-    df_copy.loc[:, 'high-prevclose'] = abs(df_copy['High'] - df_copy['Close'].shift(1))
-    df_copy.loc[:, 'low-prevclose'] = abs(df_copy['Low'] - df_copy['Close'].shift(1))
+    # fmax ignores NaN, so the first true range is simply high - low
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
     
-    df_copy.loc[:, 'true_range'] = df_copy[['high-low', 'high-prevclose', 'low-prevclose']].max(axis=1)
-    df_copy.loc[:, 'atr'] = df_copy['true_range'].ewm(alpha=1/period, adjust=False).mean()
+    alpha = 1.0 / period
+    atr = np.empty_like(true_range)
+    if len(atr) == 0:
+        return atr
     
-    return df_copy
+    atr[0] = true_range[0]
+    for i in range(1, len(true_range)):
+        smoothed = atr[i - 1] + alpha * (true_range[i] - atr[i - 1])
+        atr[i] = np.where(np.isnan(atr[i - 1]), true_range[i], smoothed)
+    
+    return atr
 
 
-def calculate_momentum_vola(ticker: str, end_date: datetime) -> Optional[float]:
+def month_end_mask(index: pd.DatetimeIndex) -> np.ndarray:
     """
-    Calculate MomentumVola score for a ticker.
+    Flag the last row of each calendar month in a sorted daily index.
     
     Args:
-        ticker: Stock symbol
-        end_date: End date for calculation (last closed month)
+        index: Daily DatetimeIndex in ascending order
     
     Returns:
-        MomentumVola score or None if calculation fails
+        Boolean array, True on the last trading day of each month
     """
-    try:
-        start_date = end_date - timedelta(days=913)  # 2.5 years
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-        
-        # Get daily data
-        data_daily = yf.Ticker(ticker).history(start=start_date_str, end=end_date_str, interval="1d")
-        
-        if len(data_daily) < 100:  # Need at least ~100 days of data
-            return None
-        
-        # Convert to float and clean
-        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-            if col in data_daily.columns:
-                data_daily[col] = pd.to_numeric(data_daily[col], errors='coerce')
-        data_daily.dropna(subset=['Close', 'High', 'Low'], inplace=True)
-        
-        if len(data_daily) < 100:  # Check again after cleaning
-            return None
-        
-        # Resample to monthly (last trading day of each month)
-        data_mo = data_daily.resample('ME').last().dropna()  # Changed 'M' to 'ME' (month end)
-        
-        if len(data_mo) < 8:
-            return None
-        
-        # Calculate momentum (average of last 3 monthly returns)
-        data_mo.loc[:, 'monthly_return'] = data_mo['Close'].pct_change()
-        momentum = data_mo['monthly_return'].iloc[-3:].mean()
-        
-        # Calculate ATR-based volatility
-        data_mo_with_atr = calculate_wilder_atr(data_mo, period=8)
-        df_vol_period = data_mo_with_atr.iloc[-8:]
-        volatility = df_vol_period['atr'].mean()
-        
-        if volatility == 0 or pd.isna(volatility) or pd.isna(momentum):
-            return None
-        
-        score = momentum / volatility
-        return score
-        
-    except Exception as e:
-        # Uncomment for debugging:
-        # print(f"  Error calculating {ticker}: {e}")
-        return None
+    month_keys = (index.year * 12 + index.month).to_numpy()
+    mask = np.ones(len(month_keys), dtype=bool)
+    mask[:-1] = month_keys[1:] != month_keys[:-1]
+    return mask
+
+
+def score_momentum_vola(history: pd.DataFrame, tickers: List[str]) -> pd.Series:
+    """
+    Calculate MomentumVola scores for several tickers at once.
+    
+    Works on (dates x tickers) matrices: the month-end resample, the momentum
+    (average of the last 3 monthly returns) and the Wilder ATR volatility
+    (average of the last 8 monthly ATR values) run as single array passes
+    over all tickers instead of one pandas pipeline per ticker.
+    
+    Args:
+        history: Batched daily history ending at the last closed month (~2.5 years)
+        tickers: Tickers of the history to score
+    
+    Returns:
+        Series of scores indexed by ticker, without tickers that cannot be scored
+    """
+    if history.empty or not tickers:
+        return pd.Series(dtype=float)
+    
+    close, high, low = (
+        coerce_numeric(history.xs(field, level=1, axis=1).reindex(columns=tickers)).to_numpy(dtype=float)
+        for field in ('Close', 'High', 'Low')
+    )
+    
+    # A session only counts for a ticker when Close, High and Low are all present
+    valid = ~(np.isnan(close) | np.isnan(high) | np.isnan(low))
+    enough_days = valid.sum(axis=0) >= 100  # Need at least ~100 days of data
+    
+    # Row of the last valid session of each month, per ticker. Months without
+    # any valid session are masked out by `traded`.
+    month_ends = month_end_mask(history.index)
+    sessions_seen = np.cumsum(valid, axis=0)[month_ends]
+    traded = np.diff(sessions_seen, axis=0, prepend=0) > 0
+    enough_months = traded.sum(axis=0) >= 8
+    if len(sessions_seen) < 8 or not (enough_days & enough_months).any():
+        return pd.Series(dtype=float)
+    
+    rows = np.arange(len(valid))[:, None]
+    last_valid_row = np.maximum.accumulate(np.where(valid, rows, 0), axis=0)[month_ends]
+    
+    # The same rows are gathered for the three fields, so the packing order
+    # that moves missing months to the top is shared too
+    pack_order = np.argsort(traded, axis=0, kind='stable')
+    source_rows = np.take_along_axis(last_valid_row, pack_order, axis=0)
+    packed_traded = np.take_along_axis(traded, pack_order, axis=0)
+    
+    def monthly(values: np.ndarray) -> np.ndarray:
+        return np.where(packed_traded, np.take_along_axis(values, source_rows, axis=0), np.nan)
+    
+    close_mo, high_mo, low_mo = monthly(close), monthly(high), monthly(low)
+    
+    # Average of the last 3 monthly returns
+    momentum = np.mean(close_mo[-3:] / close_mo[-4:-1] - 1.0, axis=0)
+    
+    # ATR-based volatility
+    atr = calculate_wilder_atr(high_mo, low_mo, close_mo, period=8)
+    volatility = atr[-8:].mean(axis=0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = momentum / volatility
+    
+    usable = enough_days & enough_months & np.isfinite(scores)
+    return pd.Series(scores[usable], index=np.asarray(tickers)[usable])
 
 
 # ============================================================================
@@ -284,7 +543,17 @@ class MomentumVolaStrategy(MomentumStrategy):
         uninvested_cash: Decimal,
         run_date: date
     ) -> List[Allocation]:
-        """Calculate allocations using MomentumVola algorithm"""
+        """
+        Calculate allocations using MomentumVola algorithm
+        
+        Allocations only depend on the run date, so they are cached on disk
+        for 12h and retries or repeated runs on the same day reuse them.
+        """
+        key = f"allocations/{type(self).__name__}_{run_date.isoformat()}"
+        return _cache.get_or_compute(key, lambda: self._compute_allocations(run_date), ALLOCATIONS_TTL)
+    
+    def _compute_allocations(self, run_date: date) -> List[Allocation]:
+        """Run the MomentumVola algorithm for a given date"""
         
         print("="*80)
         print("🚀 Starting MomentumVola algorithm...")
@@ -297,8 +566,12 @@ class MomentumVolaStrategy(MomentumStrategy):
         sp500_url = 'https://en.wikipedia.org/wiki/List_of_S&P_500_companies'
         nasdaq100_url = 'https://en.wikipedia.org/wiki/Nasdaq-100'
         
-        sp500_map = get_index_constituents(sp500_url, table_id="constituents")
-        nasdaq100_map = get_index_constituents(nasdaq100_url, table_id="constituents")
+        # Both pages are independent requests, fetch them concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sp500_future = executor.submit(get_index_constituents, sp500_url, "constituents")
+            nasdaq100_future = executor.submit(get_index_constituents, nasdaq100_url, "constituents")
+            sp500_map = sp500_future.result()
+            nasdaq100_map = nasdaq100_future.result()
         
         sp500_tickers = set(sp500_map.keys())
         nasdaq100_tickers = set(nasdaq100_map.keys())
@@ -314,29 +587,17 @@ class MomentumVolaStrategy(MomentumStrategy):
         
         print(f"✅ Found {len(common_tickers)} common stocks")
         
+        # SPY shares the 1-year download with the stocks to filter
+        filter_start = run_date - timedelta(days=365)
+        filter_history = download_history(sorted(common_tickers | {"SPY"}), start=filter_start)
+        
         # Step 3: Check SPY market condition
-        if not check_spy_market_condition():
+        if not check_spy_market_condition(get_ticker_history(filter_history, "SPY")):
             raise ValueError("SPY is below its 220-day moving average. Market condition not met.")
         
         # Step 4: Filter stocks by 220-day MA
         print("🔍 Filtering stocks by 220-day moving average...")
-        filtered_stocks = []
-        
-        for ticker in common_tickers:
-            try:
-                data = yf.Ticker(ticker).history(period="1y", interval="1d")
-                
-                for col in ['Close']:
-                    if col in data.columns:
-                        data[col] = pd.to_numeric(data[col], errors='coerce')
-                data.dropna(subset=['Close'], inplace=True)
-                
-                if len(data) >= 220:
-                    data['SMA_220'] = data['Close'].rolling(window=220).mean()
-                    if data['Close'].iloc[-1] > data['SMA_220'].iloc[-1]:
-                        filtered_stocks.append(ticker)
-            except Exception:
-                pass
+        filtered_stocks = filter_above_sma_220(filter_history, sorted(common_tickers))
         
         if not filtered_stocks:
             raise ValueError("No stocks passed the 220-day MA filter")
@@ -345,19 +606,23 @@ class MomentumVolaStrategy(MomentumStrategy):
         
         # Step 5: Calculate MomentumVola scores
         print("🔍 Calculating MomentumVola scores...")
-        scores = {}
         
-        for ticker in filtered_stocks:
-            score = calculate_momentum_vola(ticker, last_closed_date)
-            if score is not None:
-                scores[ticker] = score
+        # Daily bars on purpose: the monthly ATR uses the High/Low of each month's
+        # last session, while interval="1mo" bars carry the month's extremes
+        start_date = last_closed_date - timedelta(days=913)  # 2.5 years
+        momentum_history = download_history(
+            filtered_stocks,
+            start=start_date.date(),
+            end=last_closed_date.date()
+        )
+        
+        scores = score_momentum_vola(momentum_history, filtered_stocks)
         
-        if not scores:
+        if scores.empty:
             raise ValueError("Unable to calculate MomentumVola scores for any stocks")
         
-        # Step 6: Rank and select top 4
-        ranked_tickers = sorted(scores, key=scores.get, reverse=True)
-        top_4_tickers = ranked_tickers[:4]
+        # Step 6: Rank and select top 4 (partial selection, no full sort)
+        top_4_tickers = scores.nlargest(4).index.tolist()
         
         if len(top_4_tickers) < 4:
             print(f"⚠️ Only {len(top_4_tickers)} stocks available (expected 4)")
@@ -400,6 +665,7 @@ class MomentumVolaStrategy(MomentumStrategy):
 
 
 # Default strategy to use
+@lru_cache(maxsize=1)
 def get_strategy() -> MomentumStrategy:
-    """Get the current momentum strategy instance"""
+    """Get the current momentum strategy instance (stateless, built once per process)"""
     return MomentumVolaStrategy()
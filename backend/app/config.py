@@ -8,6 +8,7 @@ class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./database/momentor.db")
     ENABLE_AUTO_SCHEDULING: bool = os.getenv("ENABLE_AUTO_SCHEDULING", "true").lower() == "true"
     TIMEZONE: str = os.getenv("TZ", "Europe/Paris")
+    CACHE_DIR: str = os.getenv("CACHE_DIR", "./.cache")
     
     class Config:
         env_file = ".env"
@@ -1,14 +1,27 @@
 """Database configuration and session management"""
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
 
+# Pool sized for the threadpool that runs the sync route handlers; an
+# in-memory SQLite database uses a single-connection pool instead
+_database_url = make_url(settings.DATABASE_URL)
+_in_memory = _database_url.get_backend_name() == "sqlite" and _database_url.database in (None, "", ":memory:")
+_pool_args = {} if _in_memory else {
+    "pool_size": 20,
+    "max_overflow": 40,
+    "pool_recycle": 3600,
+    "pool_pre_ping": True
+}
+
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    **_pool_args
 )
 
 # Create session factory
@@ -2,11 +2,12 @@
 MoMentor - Momentum Investing Strategy Mentor
 FastAPI application entry point
 """
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from sqlalchemy.orm import Session
 
-from app.database import engine, Base
+from app.database import engine, Base, get_db
 from app.migrations import run_schema_migrations
 from app.routes import runs, portfolio
 from app.scheduler import start_scheduler, shutdown_scheduler
@@ -58,15 +59,13 @@ async def health_check():
 
 
 @app.post("/api/reset")
-async def reset_database():
+def reset_database(db: Session = Depends(get_db)):
     """Reset all data in the database"""
-    from app.database import SessionLocal
     from app.models import (
         AlgorithmRun, RecommendedAllocation, OptimizedMoveCashflow,
         OptimizedMoveSwap, ActualPosition, ActualCash, PriceCache, SchedulerLog
     )
     
-    db = SessionLocal()
     try:
         # Delete all records from all tables
         db.query(ActualPosition).delete()
@@ -83,5 +82,3 @@ async def reset_database():
     except Exception as e:
         db.rollback()
         raise
-    finally:
-        db.close()
@@ -28,6 +28,11 @@ def run_schema_migrations(engine: Engine) -> None:
                 text("ALTER TABLE algorithm_runs ADD COLUMN allocation_residual_cash_usd NUMERIC(15,2) NOT NULL DEFAULT 0")
             )
 
+        indexes = {index["name"] for index in inspector.get_indexes("algorithm_runs")}
+
+        if "ix_algorithm_runs_status" not in indexes:
+            connection.execute(text("CREATE INDEX ix_algorithm_runs_status ON algorithm_runs (status)"))
+
         connection.execute(text("UPDATE algorithm_runs SET input_currency = COALESCE(input_currency, 'USD')"))
         connection.execute(text("UPDATE algorithm_runs SET fx_rate_to_usd = COALESCE(fx_rate_to_usd, 1)"))
         connection.execute(text("UPDATE algorithm_runs SET allocation_residual_cash_usd = COALESCE(allocation_residual_cash_usd, 0)"))
@@ -39,7 +39,7 @@ class AlgorithmRun(Base):
     fx_rate_to_usd = Column(Numeric(precision=12, scale=6), nullable=False, default=1)
     fx_rate_timestamp_utc = Column(DateTime, nullable=True)
     allocation_residual_cash_usd = Column(Numeric(precision=15, scale=2), nullable=False, default=0)
-    status = Column(SQLEnum(RunStatus), nullable=False, default=RunStatus.PENDING)
+    status = Column(SQLEnum(RunStatus), nullable=False, default=RunStatus.PENDING, index=True)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
     # Relationships
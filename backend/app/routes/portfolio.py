@@ -9,7 +9,7 @@ router = APIRouter()
 
 
 @router.get("/current")
-async def get_current_portfolio(db: Session = Depends(get_db)):
+def get_current_portfolio(db: Session = Depends(get_db)):
     """Get current portfolio with live prices and PnL"""
     portfolio_service = PortfolioService(db)
     return portfolio_service.get_current_portfolio_value()
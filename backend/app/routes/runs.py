@@ -1,5 +1,6 @@
 """API routes for algorithm runs"""
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import exists, insert, select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Literal
@@ -7,12 +8,17 @@ from decimal import Decimal
 from datetime import datetime
 
 from app.database import get_db
-from app.models import AlgorithmRun, RunStatus, ActualPosition, ActualCash
+from app.models import (
+    AlgorithmRun, RunStatus, RecommendedAllocation, OptimizedMoveCashflow,
+    OptimizedMoveSwap, ActualPosition, ActualCash
+)
 from app.services.run_generator import generate_algorithm_run
 from app.services.market_data import MarketDataUnavailableError, MarketDataService
 
 router = APIRouter()
 
+_CENT = Decimal("0.01")
+
 
 class GenerateRunRequest(BaseModel):
     """Request to generate a new run"""
@@ -36,7 +42,7 @@ class ConfirmPositionsRequest(BaseModel):
 
 
 @router.post("/generate")
-async def generate_run(request: GenerateRunRequest, db: Session = Depends(get_db)):
+def generate_run(request: GenerateRunRequest, db: Session = Depends(get_db)):
     """Generate a new algorithm run with recommendations"""
     try:
         manual_capital = Decimal(str(request.capital)) if request.capital is not None else None
@@ -66,7 +72,7 @@ async def generate_run(request: GenerateRunRequest, db: Session = Depends(get_db
 
 
 @router.post("/trigger-monthly")
-async def trigger_monthly(db: Session = Depends(get_db)):
+def trigger_monthly(db: Session = Depends(get_db)):
     """Trigger monthly run (called by scheduler)"""
     try:
         run = generate_algorithm_run(db=db, mode="monthly", manual_capital=None)
@@ -76,16 +82,31 @@ async def trigger_monthly(db: Session = Depends(get_db)):
 
 
 @router.get("/has-pending")
-async def has_pending_runs(db: Session = Depends(get_db)):
+def has_pending_runs(db: Session = Depends(get_db)):
     """Check if there are any pending runs"""
-    count = db.query(AlgorithmRun).filter(AlgorithmRun.status == RunStatus.PENDING).count()
-    return {"has_pending": count > 0}
+    has_pending = db.query(exists().where(AlgorithmRun.status == RunStatus.PENDING)).scalar()
+    return {"has_pending": bool(has_pending)}
 
 
 @router.get("")
-async def list_runs(db: Session = Depends(get_db)):
+def list_runs(db: Session = Depends(get_db)):
     """List all algorithm runs"""
-    runs = db.query(AlgorithmRun).order_by(AlgorithmRun.run_date.desc()).all()
+    # Only the serialized columns are selected, no ORM instances are built
+    runs = (
+        db.query(
+            AlgorithmRun.id,
+            AlgorithmRun.run_date,
+            AlgorithmRun.trigger_type,
+            AlgorithmRun.total_capital_usd,
+            AlgorithmRun.input_currency,
+            AlgorithmRun.fx_rate_to_usd,
+            AlgorithmRun.fx_rate_timestamp_utc,
+            AlgorithmRun.status,
+            AlgorithmRun.created_at
+        )
+        .order_by(AlgorithmRun.run_date.desc())
+        .all()
+    )
     
     return {
         "runs": [
@@ -106,33 +127,54 @@ async def list_runs(db: Session = Depends(get_db)):
 
 
 @router.get("/{run_id}/details")
-async def get_run_details(run_id: int, db: Session = Depends(get_db)):
+def get_run_details(run_id: int, db: Session = Depends(get_db)):
     """Get detailed information about a specific run"""
-    run = db.query(AlgorithmRun).filter(AlgorithmRun.id == run_id).first()
+    run = db.execute(select(AlgorithmRun).where(AlgorithmRun.id == run_id)).scalar_one_or_none()
     
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
     
+    # Child rows are read-only here: select only the serialized columns
+    # instead of hydrating ORM objects
+    
     # Get recommendations
     recommendations = [
         {
-            "symbol": alloc.symbol,
-            "target_percentage": float(alloc.target_percentage),
-            "target_amount_usd": float(alloc.target_amount_usd)
+            "symbol": symbol,
+            "target_percentage": float(target_percentage),
+            "target_amount_usd": float(target_amount_usd)
         }
-        for alloc in run.recommended_allocations
+        for symbol, target_percentage, target_amount_usd in db.execute(
+            select(
+                RecommendedAllocation.symbol,
+                RecommendedAllocation.target_percentage,
+                RecommendedAllocation.target_amount_usd
+            )
+            .where(RecommendedAllocation.run_id == run_id)
+            .order_by(RecommendedAllocation.id)
+        )
     ]
     
     # Get cashflow moves
     cashflow_moves = [
         {
-            "symbol": move.symbol,
-            "action": move.action.value,
-            "suggested_shares": float(move.suggested_shares),
-            "suggested_value_usd": float(move.suggested_value_usd),
-            "order_index": move.order_index
+            "symbol": symbol,
+            "action": action.value,
+            "suggested_shares": float(suggested_shares),
+            "suggested_value_usd": float(suggested_value_usd),
+            "order_index": order_index
         }
-        for move in sorted(run.cashflow_moves, key=lambda x: x.order_index)
+        for symbol, action, suggested_shares, suggested_value_usd, order_index in db.execute(
+            select(
+                OptimizedMoveCashflow.symbol,
+                OptimizedMoveCashflow.action,
+                OptimizedMoveCashflow.suggested_shares,
+                OptimizedMoveCashflow.suggested_value_usd,
+                OptimizedMoveCashflow.order_index
+            )
+            .where(OptimizedMoveCashflow.run_id == run_id)
+            .order_by(OptimizedMoveCashflow.order_index)
+        )
     ]
     
     # Get swap moves
@@ -146,7 +188,18 @@ async def get_run_details(run_id: int, db: Session = Depends(get_db)):
             "order_index": move.order_index,
             "description": _format_swap_description(move)
         }
-        for move in sorted(run.swap_moves, key=lambda x: x.order_index)
+        for move in db.execute(
+            select(
+                OptimizedMoveSwap.from_symbol,
+                OptimizedMoveSwap.to_symbol,
+                OptimizedMoveSwap.swap_shares_from,
+                OptimizedMoveSwap.swap_shares_to,
+                OptimizedMoveSwap.swap_value_usd,
+                OptimizedMoveSwap.order_index
+            )
+            .where(OptimizedMoveSwap.run_id == run_id)
+            .order_by(OptimizedMoveSwap.order_index)
+        )
     ]
     
     # Get actual positions if confirmed
@@ -156,17 +209,30 @@ async def get_run_details(run_id: int, db: Session = Depends(get_db)):
     if run.status == RunStatus.COMPLETED:
         actual_positions = [
             {
-                "symbol": pos.symbol,
-                "actual_shares": float(pos.actual_shares),
-                "actual_avg_price_usd": float(pos.actual_avg_price_usd),
-                "total_value_usd": float(pos.total_value_usd),
-                "first_validation_date": pos.first_validation_date.isoformat()
+                "symbol": symbol,
+                "actual_shares": float(actual_shares),
+                "actual_avg_price_usd": float(actual_avg_price_usd),
+                "total_value_usd": float(total_value_usd),
+                "first_validation_date": first_validation_date.isoformat()
             }
-            for pos in run.actual_positions
+            for symbol, actual_shares, actual_avg_price_usd, total_value_usd, first_validation_date in db.execute(
+                select(
+                    ActualPosition.symbol,
+                    ActualPosition.actual_shares,
+                    ActualPosition.actual_avg_price_usd,
+                    ActualPosition.total_value_usd,
+                    ActualPosition.first_validation_date
+                )
+                .where(ActualPosition.run_id == run_id)
+                .order_by(ActualPosition.id)
+            )
         ]
         
-        if run.actual_cash:
-            actual_cash_value = float(run.actual_cash.uninvested_cash_usd)
+        actual_cash = db.execute(
+            select(ActualCash.uninvested_cash_usd).where(ActualCash.run_id == run_id)
+        ).scalar_one_or_none()
+        if actual_cash is not None:
+            actual_cash_value = float(actual_cash)
     
     return {
         "id": run.id,
@@ -189,13 +255,13 @@ async def get_run_details(run_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/{run_id}/confirm-positions")
-async def confirm_positions(
+def confirm_positions(
     run_id: int,
     request: ConfirmPositionsRequest,
     db: Session = Depends(get_db)
 ):
     """Confirm actual positions after rebalancing"""
-    run = db.query(AlgorithmRun).filter(AlgorithmRun.id == run_id).first()
+    run = db.execute(select(AlgorithmRun).where(AlgorithmRun.id == run_id)).scalar_one_or_none()
     
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
@@ -203,9 +269,26 @@ async def confirm_positions(
     if run.status == RunStatus.COMPLETED:
         raise HTTPException(status_code=400, detail="Run already completed")
     
-    # Calculate total value from positions
-    total_value = sum(Decimal(str(pos.shares)) * Decimal(str(pos.avg_price)) for pos in request.positions)
-    total_value += Decimal(str(request.uninvested_cash))
+    # Convert each position once: the same pass builds the rows to insert
+    # and the total value used for the discrepancy check
+    validation_date = datetime.utcnow()
+    uninvested_cash = Decimal(str(request.uninvested_cash))
+    total_value = uninvested_cash
+    position_rows = []
+    
+    for pos_data in request.positions:
+        shares = Decimal(str(pos_data.shares))
+        avg_price = Decimal(str(pos_data.avg_price))
+        value = shares * avg_price
+        total_value += value
+        position_rows.append({
+            "run_id": run.id,
+            "symbol": pos_data.symbol,
+            "actual_shares": shares,
+            "actual_avg_price_usd": avg_price,
+            "total_value_usd": value.quantize(_CENT),
+            "first_validation_date": validation_date
+        })
     
     # Check for significant discrepancy (>10%)
     expected_value = run.total_capital_usd
@@ -220,12 +303,13 @@ async def confirm_positions(
             "expected_value": float(expected_value)
         }
     
-    # Try to get current prices for validation
+    # Check market data availability, only hitting Yahoo when the cache is cold
     symbols = [pos.symbol for pos in request.positions]
     market_data_service = MarketDataService(db)
     
     try:
-        market_data_service.get_quotes(symbols)
+        if not market_data_service.probe_availability(symbols):
+            market_data_service.get_quotes(symbols)
     except MarketDataUnavailableError:
         if not request.force_confirm:
             return {
@@ -234,24 +318,14 @@ async def confirm_positions(
                 "message": "Market data is currently unavailable. You can confirm anyway and we will use your entered prices."
             }
     
-    # Save actual positions
-    validation_date = datetime.utcnow()
-    
-    for pos_data in request.positions:
-        position = ActualPosition(
-            run_id=run.id,
-            symbol=pos_data.symbol,
-            actual_shares=Decimal(str(pos_data.shares)),
-            actual_avg_price_usd=Decimal(str(pos_data.avg_price)),
-            total_value_usd=(Decimal(str(pos_data.shares)) * Decimal(str(pos_data.avg_price))).quantize(Decimal("0.01")),
-            first_validation_date=validation_date
-        )
-        db.add(position)
+    # Save actual positions in a single executemany INSERT
+    if position_rows:
+        db.execute(insert(ActualPosition), position_rows)
     
     # Save actual cash
     cash = ActualCash(
         run_id=run.id,
-        uninvested_cash_usd=Decimal(str(request.uninvested_cash)),
+        uninvested_cash_usd=uninvested_cash,
         first_validation_date=validation_date
     )
     db.add(cash)
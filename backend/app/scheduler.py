@@ -2,7 +2,7 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime
-import pytz
+from zoneinfo import ZoneInfo
 
 from app.config import settings
 from app.database import SessionLocal
@@ -10,6 +10,9 @@ from app.models import SchedulerLog
 
 scheduler = None
 
+# Resolved once, used for the job timestamps and the cron trigger
+_TZ = ZoneInfo(settings.TIMEZONE)
+
 
 def monthly_algorithm_job():
     """Job that runs on the 1st of each month at 11:00 Paris time"""
@@ -26,7 +29,7 @@ def monthly_algorithm_job():
         
         # Log success
         log = SchedulerLog(
-            run_date=datetime.now(pytz.timezone(settings.TIMEZONE)),
+            run_date=datetime.now(_TZ),
             status="success",
             error=None
         )
@@ -38,7 +41,7 @@ def monthly_algorithm_job():
     except Exception as e:
         # Log error
         log = SchedulerLog(
-            run_date=datetime.now(pytz.timezone(settings.TIMEZONE)),
+            run_date=datetime.now(_TZ),
             status="error",
             error=str(e)[:500]
         )
@@ -59,14 +62,14 @@ def start_scheduler():
         print("⚠ Scheduler already running")
         return
     
-    scheduler = BackgroundScheduler(timezone=settings.TIMEZONE)
+    scheduler = BackgroundScheduler(timezone=_TZ)
     
     # Schedule job: 11:00 on the 1st of every month (Paris time)
     trigger = CronTrigger(
         hour=11,
         minute=0,
         day=1,
-        timezone=pytz.timezone(settings.TIMEZONE)
+        timezone=_TZ
     )
     
     scheduler.add_job(
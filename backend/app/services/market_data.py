@@ -1,15 +1,25 @@
 """Market data service using Yahoo Finance"""
 import logging
+import random
+import threading
+import time
 import yfinance as yf
 from decimal import Decimal
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from app.models import PriceCache
 
 logger = logging.getLogger(__name__)
 
+# Process-wide price cache shared by every MarketDataService instance, so
+# quotes fetched for one request are reused by the next ones
+_PRICE_CACHE: Dict[str, tuple[Decimal, datetime]] = {}
+_PRICE_CACHE_LOCK = threading.Lock()
+
 
 class MarketDataUnavailableError(Exception):
     """Exception raised when market data cannot be fetched"""
@@ -21,8 +31,12 @@ class MarketDataService:
     
     def __init__(self, db: Session):
         self.db = db
-        self._memory_cache: Dict[str, tuple[Decimal, datetime]] = {}
         self._cache_duration = timedelta(minutes=5)
+        self._fx_cache_duration = timedelta(hours=1)
+    
+    def _cache_duration_for(self, symbol: str) -> timedelta:
+        """FX pairs (Yahoo "=X" symbols) move slowly and are kept longer than equities"""
+        return self._fx_cache_duration if symbol.endswith("=X") else self._cache_duration
     
     def get_quotes(self, symbols: List[str]) -> Dict[str, Decimal]:
         """
@@ -42,13 +56,13 @@ class MarketDataService:
         
         # Check memory cache first
         now = datetime.utcnow()
-        for symbol in symbols:
-            if symbol in self._memory_cache:
-                price, timestamp = self._memory_cache[symbol]
-                if now - timestamp < self._cache_duration:
-                    result[symbol] = price
+        with _PRICE_CACHE_LOCK:
+            for symbol in symbols:
+                cached = _PRICE_CACHE.get(symbol)
+                if cached and now - cached[1] < self._cache_duration_for(symbol):
+                    result[symbol] = cached[0]
                     continue
-            symbols_to_fetch.append(symbol)
+                symbols_to_fetch.append(symbol)
         
         # Fetch remaining symbols from Yahoo Finance
         if symbols_to_fetch:
@@ -56,12 +70,47 @@ class MarketDataService:
             result.update(fetched_prices)
             
             # Update memory cache and database cache
-            for symbol, price in fetched_prices.items():
-                self._memory_cache[symbol] = (price, now)
-                self._save_to_cache(symbol, price, now)
+            with _PRICE_CACHE_LOCK:
+                for symbol, price in fetched_prices.items():
+                    _PRICE_CACHE[symbol] = (price, now)
+            
+            self._save_to_cache(fetched_prices, now)
         
         return result
 
+    def probe_availability(self, symbols: List[str]) -> bool:
+        """
+        Check whether fresh prices are already cached for all symbols
+        
+        Looks at the memory cache, then at the database cache, without
+        calling Yahoo Finance.
+        
+        Args:
+            symbols: List of stock symbols
+            
+        Returns:
+            True if every symbol has a price within its cache duration
+        """
+        now = datetime.utcnow()
+        with _PRICE_CACHE_LOCK:
+            missing = [
+                symbol for symbol in symbols
+                if symbol not in _PRICE_CACHE or now - _PRICE_CACHE[symbol][1] >= self._cache_duration_for(symbol)
+            ]
+        
+        if not missing:
+            return True
+        
+        try:
+            rows = self.db.execute(
+                select(PriceCache.symbol, PriceCache.timestamp).where(PriceCache.symbol.in_(missing))
+            ).all()
+        except Exception:
+            return False
+        
+        fresh = {symbol for symbol, timestamp in rows if now - timestamp < self._cache_duration_for(symbol)}
+        return all(symbol in fresh for symbol in missing)
+
     def get_eur_usd_rate(self) -> Decimal:
         """Get EUR/USD FX rate (USD per 1 EUR) with cache fallback."""
         fx_symbol = "EURUSD=X"
@@ -94,9 +143,10 @@ class MarketDataService:
         Raises:
             MarketDataUnavailableError: If all retries fail
         """
-        def _extract_close(history, symbol: str):
+        def _last_closes(history, symbols: List[str]) -> Dict[str, float]:
+            """Resolve the close column layout once and return the last close of each symbol"""
             if history is None or getattr(history, "empty", True):
-                return None
+                return {}
 
             try:
                 if hasattr(history.columns, "levels"):
@@ -113,94 +163,91 @@ class MarketDataService:
                         elif "Close" in history.columns.levels[0]:
                             close_level_index = 0
                         else:
-                            return None
+                            return {}
 
                     if close_level_index == 0:
                         close_data = history["Close"]
                     else:
                         close_data = history.xs("Close", level=close_level_index, axis=1)
 
-                    if hasattr(close_data, "columns") and symbol in close_data.columns:
-                        series = close_data[symbol]
-                    else:
-                        series = close_data
+                    if not hasattr(close_data, "columns"):
+                        close_data = close_data.to_frame()
                 else:
                     if "Close" not in history.columns:
-                        return None
-                    series = history["Close"]
+                        return {}
+                    close_data = history[["Close"]]
 
-                if getattr(series, "empty", True):
-                    return None
+                # Symbols of a batch can trade on different calendars, so the
+                # last row may be empty for some of them: take the last valid
+                # close of each column
+                last_closes = close_data.ffill().iloc[-1]
+                if len(last_closes) == 1 and len(symbols) == 1:
+                    last_closes.index = symbols
+                last_closes = last_closes.dropna()
 
-                return series.iloc[-1]
+                return {symbol: last_closes[symbol] for symbol in symbols if symbol in last_closes.index}
             except Exception:
-                return None
+                return {}
 
         for attempt in range(retry_count):
             try:
                 prices = {}
-                missing = []
 
-                logger.warning("Yahoo fetch attempt %s for symbols=%s", attempt + 1, symbols)
+                logger.debug("Yahoo fetch attempt %s for symbols=%s", attempt + 1, symbols)
 
-                for symbol in symbols:
-                    price = None
-                    ticker = yf.Ticker(symbol)
+                # Fast path: one batched download for every symbol
+                try:
+                    history = yf.download(
+                        tickers=" ".join(symbols),
+                        period="1d",
+                        interval="1d",
+                        group_by="ticker",
+                        auto_adjust=False,
+                        threads=True,
+                        progress=False,
+                    )
+                    logger.debug("Yahoo download columns=%s empty=%s", getattr(history, "columns", None), getattr(history, "empty", None))
+                except Exception as exc:
+                    logger.warning("Yahoo download error for %s: %s", symbols, exc)
+                    history = None
+
+                for symbol, price in _last_closes(history, symbols).items():
+                    logger.debug("Yahoo extracted close for %s: %s", symbol, price)
+                    prices[symbol] = Decimal(str(price))
 
-                    # Fast path: avoid heavy info requests
+                # Fallback: per-symbol fast_info for whatever the batch missed
+                missing = [symbol for symbol in symbols if symbol not in prices]
+                if missing:
+                    logger.debug("Yahoo fast_info fallback for symbols=%s", missing)
+
+                unresolved = []
+                for symbol in missing:
+                    price = None
                     try:
-                        fast_info = ticker.fast_info
+                        fast_info = yf.Ticker(symbol).fast_info
                         if fast_info:
                             price = (
                                 fast_info.get("last_price")
                                 or fast_info.get("regular_market_price")
                                 or fast_info.get("previous_close")
                             )
-                            logger.warning("Yahoo fast_info %s last=%s regular=%s prev=%s", symbol, fast_info.get("last_price"), fast_info.get("regular_market_price"), fast_info.get("previous_close"))
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("Yahoo fast_info %s last=%s regular=%s prev=%s", symbol, fast_info.get("last_price"), fast_info.get("regular_market_price"), fast_info.get("previous_close"))
                     except Exception as exc:
                         logger.warning("Yahoo fast_info error for %s: %s", symbol, exc)
                         price = None
 
                     if price is None:
-                        missing.append(symbol)
+                        unresolved.append(symbol)
                     else:
                         prices[symbol] = Decimal(str(price))
 
-                if missing:
-                    logger.warning("Yahoo download fallback for symbols=%s", missing)
-                    try:
-                        history = yf.download(
-                            tickers=" ".join(missing),
-                            period="1d",
-                            interval="1d",
-                            group_by="ticker",
-                            auto_adjust=False,
-                            threads=False,
-                            progress=False,
-                        )
-                        logger.warning("Yahoo download columns=%s empty=%s", getattr(history, "columns", None), getattr(history, "empty", None))
-                        if getattr(history, "empty", False) is False:
-                            try:
-                                logger.warning("Yahoo download tail=\n%s", history.tail(2))
-                            except Exception:
-                                logger.warning("Yahoo download tail logging failed")
-                    except Exception as exc:
-                        logger.warning("Yahoo download error for %s: %s", missing, exc)
-                        raise
-
-                    for symbol in missing:
-                        price = _extract_close(history, symbol)
-
-                        logger.warning("Yahoo extracted close for %s: %s", symbol, price)
-
-                        if price is None:
-                            cached = self._get_from_cache(symbol)
-                            if cached:
-                                prices[symbol] = cached
-                                continue
+                if unresolved:
+                    cached_prices = self._get_many_from_cache(unresolved)
+                    for symbol in unresolved:
+                        if symbol not in cached_prices:
                             raise ValueError(f"No price available for {symbol}")
-
-                        prices[symbol] = Decimal(str(price))
+                        prices[symbol] = cached_prices[symbol]
 
                 return prices
                 
@@ -208,11 +255,7 @@ class MarketDataService:
                 logger.warning("Yahoo fetch attempt %s failed: %s", attempt + 1, e)
                 if attempt == retry_count - 1:
                     # Last attempt failed, try database cache for all symbols
-                    cached_prices = {}
-                    for symbol in symbols:
-                        cached = self._get_from_cache(symbol)
-                        if cached:
-                            cached_prices[symbol] = cached
+                    cached_prices = self._get_many_from_cache(symbols)
                     
                     if cached_prices:
                         return cached_prices
@@ -221,22 +264,45 @@ class MarketDataService:
                         f"Failed to fetch prices after {retry_count} attempts: {str(e)}"
                     )
                 
-                # Wait before retry (exponential backoff)
-                import time
-                time.sleep(2 ** attempt)
+                # Wait before retry (exponential backoff with a little jitter so
+                # concurrent callers do not retry in lockstep)
+                time.sleep(2 ** attempt + random.uniform(0, 0.2))
         
         raise MarketDataUnavailableError("Failed to fetch prices")
     
-    def _save_to_cache(self, symbol: str, price: Decimal, timestamp: datetime):
-        """Save price to database cache"""
+    def _save_to_cache(self, prices: Dict[str, Decimal], timestamp: datetime):
+        """Upsert prices into database cache with a single statement"""
+        if not prices:
+            return
+        
+        rows = [
+            {"symbol": symbol, "price": price, "timestamp": timestamp}
+            for symbol, price in prices.items()
+        ]
+        
         try:
-            cached = self.db.query(PriceCache).filter(PriceCache.symbol == symbol).first()
-            if cached:
-                cached.price = price
-                cached.timestamp = timestamp
+            dialect = self.db.get_bind().dialect.name
+            if dialect in ("sqlite", "postgresql"):
+                insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+                stmt = insert(PriceCache).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[PriceCache.symbol],
+                    set_={"price": stmt.excluded.price, "timestamp": stmt.excluded.timestamp}
+                )
+                self.db.execute(stmt)
             else:
-                cached = PriceCache(symbol=symbol, price=price, timestamp=timestamp)
-                self.db.add(cached)
+                # Generic read-then-write for databases without ON CONFLICT
+                existing = {
+                    cached.symbol: cached
+                    for cached in self.db.query(PriceCache).filter(PriceCache.symbol.in_(prices)).all()
+                }
+                for row in rows:
+                    cached = existing.get(row["symbol"])
+                    if cached:
+                        cached.price = row["price"]
+                        cached.timestamp = row["timestamp"]
+                    else:
+                        self.db.add(PriceCache(**row))
             self.db.commit()
         except Exception:
             self.db.rollback()
@@ -244,9 +310,23 @@ class MarketDataService:
     def _get_from_cache(self, symbol: str) -> Optional[Decimal]:
         """Get price from database cache"""
         try:
-            cached = self.db.query(PriceCache).filter(PriceCache.symbol == symbol).first()
-            if cached:
-                return cached.price
+            price = self.db.execute(
+                select(PriceCache.price).where(PriceCache.symbol == symbol)
+            ).scalar_one_or_none()
+            if price:
+                return price
         except Exception:
             pass
         return None
+    
+    def _get_many_from_cache(self, symbols: List[str]) -> Dict[str, Decimal]:
+        """Get prices for several symbols from database cache in one query"""
+        try:
+            rows = (
+                self.db.query(PriceCache.symbol, PriceCache.price)
+                .filter(PriceCache.symbol.in_(symbols))
+                .all()
+            )
+            return {symbol: price for symbol, price in rows if price}
+        except Exception:
+            return {}
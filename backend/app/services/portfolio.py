@@ -1,7 +1,9 @@
 """Portfolio calculation service"""
 from decimal import Decimal
 from datetime import datetime
-from typing import Tuple
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 
 from app.models import AlgorithmRun, ActualPosition, ActualCash, RunStatus
@@ -15,6 +17,42 @@ class PortfolioService:
         self.db = db
         self.market_data_service = MarketDataService(db)
     
+    def _get_last_completed_run(self) -> Tuple[Optional[Row], List[ActualPosition], Optional[ActualCash]]:
+        """
+        Get the last completed run with its confirmed positions and cash
+        
+        Only the run columns used by the portfolio calculations are selected,
+        the children are read with one query each.
+        
+        Returns:
+            Tuple of (run row or None, actual positions, actual cash or None)
+        """
+        last_run = self.db.execute(
+            select(
+                AlgorithmRun.id,
+                AlgorithmRun.run_date,
+                AlgorithmRun.total_capital_usd,
+                AlgorithmRun.uninvested_cash_usd
+            )
+            .where(AlgorithmRun.status == RunStatus.COMPLETED)
+            .order_by(AlgorithmRun.run_date.desc())
+            .limit(1)
+        ).first()
+        
+        if not last_run:
+            return None, [], None
+        
+        actual_positions = self.db.execute(
+            select(ActualPosition)
+            .where(ActualPosition.run_id == last_run.id)
+            .order_by(ActualPosition.id)
+        ).scalars().all()
+        actual_cash = self.db.execute(
+            select(ActualCash).where(ActualCash.run_id == last_run.id)
+        ).scalar_one_or_none()
+        
+        return last_run, actual_positions, actual_cash
+    
     def calculate_next_capital(self) -> Tuple[Decimal, Decimal]:
         """
         Calculate capital for next algorithm run
@@ -23,21 +61,12 @@ class PortfolioService:
             Tuple of (total_capital_usd, uninvested_cash_usd)
         """
         # Get the last completed run
-        last_run = (
-            self.db.query(AlgorithmRun)
-            .filter(AlgorithmRun.status == RunStatus.COMPLETED)
-            .order_by(AlgorithmRun.run_date.desc())
-            .first()
-        )
+        last_run, actual_positions, actual_cash = self._get_last_completed_run()
         
         if not last_run:
             # No previous runs, return default
             return Decimal("0"), Decimal("0")
         
-        # Get actual positions for the last run
-        actual_positions = last_run.actual_positions
-        actual_cash = last_run.actual_cash
-        
         if not actual_positions and not actual_cash:
             # No actual data provided, use theoretical values
             return last_run.total_capital_usd, last_run.uninvested_cash_usd
@@ -53,7 +82,7 @@ class PortfolioService:
                 for position in actual_positions:
                     current_price = current_prices.get(position.symbol)
                     if current_price:
-                        position_value = Decimal(str(position.actual_shares)) * current_price
+                        position_value = position.actual_shares * current_price
                         total_value += position_value
             except Exception:
                 # If prices unavailable, use stored values
@@ -74,12 +103,7 @@ class PortfolioService:
             Dictionary with portfolio details and PnL
         """
         # Get the last completed run
-        last_run = (
-            self.db.query(AlgorithmRun)
-            .filter(AlgorithmRun.status == RunStatus.COMPLETED)
-            .order_by(AlgorithmRun.run_date.desc())
-            .first()
-        )
+        last_run, actual_positions, actual_cash = self._get_last_completed_run()
         
         if not last_run:
             return {
@@ -87,9 +111,6 @@ class PortfolioService:
                 "message": "No confirmed portfolio yet"
             }
         
-        actual_positions = last_run.actual_positions
-        actual_cash = last_run.actual_cash
-        
         if not actual_positions and not actual_cash:
             return {
                 "has_portfolio": False,
@@ -127,7 +148,7 @@ class PortfolioService:
         
         for position in actual_positions:
             current_price = current_prices.get(position.symbol, position.actual_avg_price_usd)
-            current_value = Decimal(str(position.actual_shares)) * current_price
+            current_value = position.actual_shares * current_price
             entry_value = position.total_value_usd
             
             pnl_usd = current_value - entry_value
@@ -1,14 +1,29 @@
 """Rebalancing service for calculating optimized moves"""
+import heapq
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_DOWN
-from typing import List, Dict, Optional
+from typing import List, Dict, NamedTuple, Optional, Tuple
 from sqlalchemy.orm import Session
 
 from app.models import ActualPosition
 from app.algo.strategy import Allocation
 
+_ZERO = Decimal("0")
+_ZERO_SHARES = Decimal("0.0000")
 
-@dataclass
+
+class _Holding(NamedTuple):
+    """Shares, value and live price held (or targeted) for one symbol"""
+    shares: Decimal
+    value: Decimal
+    price: Decimal
+
+
+# Shared default for symbols missing on one side of the diff
+_NO_HOLDING = _Holding(_ZERO_SHARES, _ZERO, _ZERO)
+
+
+@dataclass(slots=True, frozen=True)
 class CashflowMove:
     """Move with cash flow (sell then buy)"""
     symbol: str
@@ -18,7 +33,7 @@ class CashflowMove:
     order_index: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SwapMove:
     """Move with direct swap"""
     from_symbol: Optional[str]
@@ -41,13 +56,16 @@ class RebalancingService:
 
     def _quantize_shares(self, shares: Decimal) -> Decimal:
         if shares <= 0:
-            return Decimal("0.0000")
+            return _ZERO_SHARES
         return shares.quantize(self.SHARE_STEP, rounding=ROUND_DOWN)
 
     def _quantize_usd(self, amount: Decimal) -> Decimal:
         return amount.quantize(self.USD_STEP)
 
     def _shares_to_decimal(self, shares) -> Decimal:
+        # Numeric columns already come back as Decimal, skip the str round-trip
+        if isinstance(shares, Decimal):
+            return shares
         return Decimal(str(shares))
 
     def _format_shares(self, shares: Decimal) -> str:
@@ -61,11 +79,11 @@ class RebalancingService:
         total_capital: Decimal
     ) -> Decimal:
         """Estimate cash that cannot be invested due to share quantization or missing prices."""
-        residual = Decimal("0")
+        residual = _ZERO
 
         for allocation in target_allocations:
             target_value = total_capital * allocation.percentage
-            price = current_prices.get(allocation.symbol, Decimal("0"))
+            price = current_prices.get(allocation.symbol, _ZERO)
 
             if price <= 0:
                 residual += target_value
@@ -76,16 +94,72 @@ class RebalancingService:
             residual += target_value - invested_value
 
         if residual < 0:
-            residual = Decimal("0")
+            residual = _ZERO
 
         return self._quantize_usd(residual)
     
-    def calculate_cashflow_moves(
+    def compute_holdings(
         self,
         previous_positions: List[ActualPosition],
         target_allocations: List[Allocation],
         current_prices: Dict[str, Decimal],
         total_capital: Decimal
+    ) -> Tuple[Dict[str, _Holding], Dict[str, _Holding]]:
+        """
+        Build the current and target holdings shared by both move calculations
+        
+        Args:
+            previous_positions: Current positions
+            target_allocations: Target allocations from algorithm
+            current_prices: Current prices for all symbols
+            total_capital: Total capital to allocate
+            
+        Returns:
+            Tuple of (current_holdings, target_holdings) mapping symbol to shares,
+            value and live price (zero when the symbol has no quote)
+        """
+        current_holdings = {}
+        for pos in previous_positions:
+            shares = self._shares_to_decimal(pos.actual_shares)
+            price = current_prices.get(pos.symbol)
+            if price is None:
+                # No quote: value the position at its cost basis
+                value = self._quantize_usd(shares * pos.actual_avg_price_usd)
+                price = _ZERO
+            else:
+                value = self._quantize_usd(shares * price)
+            current_holdings[pos.symbol] = _Holding(shares, value, price)
+        
+        return current_holdings, self._build_target_holdings(target_allocations, current_prices, total_capital)
+    
+    def _build_target_holdings(
+        self,
+        target_allocations: List[Allocation],
+        current_prices: Dict[str, Decimal],
+        total_capital: Decimal
+    ) -> Dict[str, _Holding]:
+        """Target shares, value and price of every allocation that has a quote"""
+        target_holdings = {}
+        for allocation in target_allocations:
+            target_value = total_capital * allocation.percentage
+            price = current_prices.get(allocation.symbol, _ZERO)
+            if price > 0:
+                target_shares = self._quantize_shares(target_value / price)
+                target_holdings[allocation.symbol] = _Holding(
+                    shares=target_shares,
+                    value=self._quantize_usd(target_shares * price),
+                    price=price
+                )
+        
+        return target_holdings
+    
+    def calculate_cashflow_moves(
+        self,
+        previous_positions: List[ActualPosition],
+        target_allocations: List[Allocation],
+        current_prices: Dict[str, Decimal],
+        total_capital: Decimal,
+        holdings: Optional[Tuple[Dict[str, _Holding], Dict[str, _Holding]]] = None
     ) -> List[CashflowMove]:
         """
         Calculate optimized moves using cash flow approach
@@ -96,35 +170,34 @@ class RebalancingService:
             target_allocations: Target allocations from algorithm
             current_prices: Current prices for all symbols
             total_capital: Total capital to allocate
+            holdings: Precomputed (current, target) holdings from compute_holdings
             
         Returns:
             List of cashflow moves ordered (sells first, then buys)
         """
+        if not previous_positions:
+            # First run: nothing to sell, every target is a plain buy
+            target_holdings = holdings[1] if holdings is not None else self._build_target_holdings(
+                target_allocations, current_prices, total_capital
+            )
+            return [
+                CashflowMove(
+                    symbol=symbol,
+                    action="BUY",
+                    suggested_shares=target.shares,
+                    suggested_value_usd=target.value,
+                    order_index=order_index
+                )
+                for order_index, (symbol, target) in enumerate(target_holdings.items(), start=1)
+            ]
+        
         moves = []
         order_index = 1
         
-        # Build current holdings map
-        current_holdings = {
-            pos.symbol: {
-                "shares": self._shares_to_decimal(pos.actual_shares),
-                "value": self._quantize_usd(
-                    self._shares_to_decimal(pos.actual_shares) * current_prices.get(pos.symbol, pos.actual_avg_price_usd)
-                )
-            }
-            for pos in previous_positions
-        }
-        
-        # Build target holdings map
-        target_holdings = {}
-        for allocation in target_allocations:
-            target_value = total_capital * allocation.percentage
-            price = current_prices.get(allocation.symbol, Decimal("0"))
-            if price > 0:
-                target_shares = self._quantize_shares(target_value / price)
-                target_holdings[allocation.symbol] = {
-                    "shares": target_shares,
-                    "value": self._quantize_usd(target_shares * price)
-                }
+        # Build current and target holdings (unless the caller already did)
+        if holdings is None:
+            holdings = self.compute_holdings(previous_positions, target_allocations, current_prices, total_capital)
+        current_holdings, target_holdings = holdings
         
         # Phase 1: Generate SELL moves for positions to reduce or eliminate
         for symbol, current in current_holdings.items():
@@ -132,20 +205,18 @@ class RebalancingService:
             
             if target is None:
                 # Sell entire position
-                price = current_prices.get(symbol, Decimal("0"))
                 moves.append(CashflowMove(
                     symbol=symbol,
                     action="SELL",
-                    suggested_shares=current["shares"],
-                    suggested_value_usd=current["value"],
+                    suggested_shares=current.shares,
+                    suggested_value_usd=current.value,
                     order_index=order_index
                 ))
                 order_index += 1
-            elif target["shares"] < current["shares"]:
+            elif target.shares < current.shares:
                 # Sell partial position
-                shares_to_sell = current["shares"] - target["shares"]
-                price = current_prices.get(symbol, Decimal("0"))
-                value = self._quantize_usd(shares_to_sell * price)
+                shares_to_sell = current.shares - target.shares
+                value = self._quantize_usd(shares_to_sell * target.price)
                 moves.append(CashflowMove(
                     symbol=symbol,
                     action="SELL",
@@ -164,16 +235,15 @@ class RebalancingService:
                 moves.append(CashflowMove(
                     symbol=symbol,
                     action="BUY",
-                    suggested_shares=target["shares"],
-                    suggested_value_usd=target["value"],
+                    suggested_shares=target.shares,
+                    suggested_value_usd=target.value,
                     order_index=order_index
                 ))
                 order_index += 1
-            elif target["shares"] > current["shares"]:
+            elif target.shares > current.shares:
                 # Buy additional shares
-                shares_to_buy = target["shares"] - current["shares"]
-                price = current_prices.get(symbol, Decimal("0"))
-                value = self._quantize_usd(shares_to_buy * price)
+                shares_to_buy = target.shares - current.shares
+                value = self._quantize_usd(shares_to_buy * target.price)
                 moves.append(CashflowMove(
                     symbol=symbol,
                     action="BUY",
@@ -190,7 +260,8 @@ class RebalancingService:
         previous_positions: List[ActualPosition],
         target_allocations: List[Allocation],
         current_prices: Dict[str, Decimal],
-        total_capital: Decimal
+        total_capital: Decimal,
+        holdings: Optional[Tuple[Dict[str, _Holding], Dict[str, _Holding]]] = None
     ) -> List[SwapMove]:
         """
         Calculate optimized moves using swap approach (greedy algorithm)
@@ -201,34 +272,40 @@ class RebalancingService:
             target_allocations: Target allocations from algorithm
             current_prices: Current prices for all symbols
             total_capital: Total capital to allocate
+            holdings: Precomputed (current, target) holdings from compute_holdings
             
         Returns:
             List of swap moves
         """
-        moves = []
-        order_index = 1
-        
-        # Build current and target holdings
-        current_holdings = {
-            pos.symbol: {
-                "shares": self._shares_to_decimal(pos.actual_shares),
-                "value": self._quantize_usd(
-                    self._shares_to_decimal(pos.actual_shares) * current_prices.get(pos.symbol, pos.actual_avg_price_usd)
+        if not previous_positions:
+            # First run: no excess to match, buy every target with shares by decreasing value
+            target_holdings = holdings[1] if holdings is not None else self._build_target_holdings(
+                target_allocations, current_prices, total_capital
+            )
+            buys = sorted(
+                ((symbol, target) for symbol, target in target_holdings.items() if target.shares > 0),
+                key=lambda item: item[1].value,
+                reverse=True
+            )
+            return [
+                SwapMove(
+                    from_symbol=None,
+                    to_symbol=symbol,
+                    swap_shares_from=None,
+                    swap_shares_to=target.shares,
+                    swap_value_usd=target.value,
+                    order_index=order_index,
+                    description=f"Acheter {self._format_shares(target.shares)} {symbol}"
                 )
-            }
-            for pos in previous_positions
-        }
+                for order_index, (symbol, target) in enumerate(buys, start=1)
+            ]
         
-        target_holdings = {}
-        for allocation in target_allocations:
-            target_value = total_capital * allocation.percentage
-            price = current_prices.get(allocation.symbol, Decimal("0"))
-            if price > 0:
-                target_shares = self._quantize_shares(target_value / price)
-                target_holdings[allocation.symbol] = {
-                    "shares": target_shares,
-                    "value": self._quantize_usd(target_shares * price)
-                }
+        moves = []
+        
+        # Build current and target holdings (unless the caller already did)
+        if holdings is None:
+            holdings = self.compute_holdings(previous_positions, target_allocations, current_prices, total_capital)
+        current_holdings, target_holdings = holdings
         
         # Identify excess (to sell) and deficit (to buy)
         excess = []  # [(symbol, shares, value)]
@@ -236,66 +313,99 @@ class RebalancingService:
         
         # Find positions to reduce or eliminate
         for symbol, current in current_holdings.items():
-            target = target_holdings.get(symbol, {"shares": Decimal("0.0000"), "value": Decimal("0")})
-            if current["shares"] > target["shares"]:
-                diff_shares = current["shares"] - target["shares"]
-                price = current_prices.get(symbol, Decimal("0"))
-                diff_value = self._quantize_usd(diff_shares * price)
+            target = target_holdings.get(symbol, _NO_HOLDING)
+            if current.shares > target.shares:
+                diff_shares = current.shares - target.shares
+                diff_value = self._quantize_usd(diff_shares * current.price)
                 excess.append((symbol, diff_shares, diff_value))
         
         # Find positions to increase or create
         for symbol, target in target_holdings.items():
-            current = current_holdings.get(symbol, {"shares": Decimal("0.0000"), "value": Decimal("0")})
-            if target["shares"] > current["shares"]:
-                diff_shares = target["shares"] - current["shares"]
-                diff_value = target["value"] - current["value"]
+            current = current_holdings.get(symbol, _NO_HOLDING)
+            if target.shares > current.shares:
+                diff_shares = target.shares - current.shares
+                diff_value = target.value - current.value
                 deficit.append((symbol, diff_shares, diff_value))
         
-        # Sort by value (greedy: match largest first)
-        excess.sort(key=lambda x: x[2], reverse=True)
-        deficit.sort(key=lambda x: x[2], reverse=True)
-        
-        # Match excess with deficit
-        for from_symbol, from_shares, from_value in excess:
-            if deficit:
-                to_symbol, to_shares, to_value = deficit.pop(0)
-                moves.append(SwapMove(
-                    from_symbol=from_symbol,
-                    to_symbol=to_symbol,
-                    swap_shares_from=from_shares,
-                    swap_shares_to=to_shares,
-                    swap_value_usd=min(from_value, to_value),
-                    order_index=order_index,
-                    description=(
-                        f"Vendre {self._format_shares(from_shares)} {from_symbol} "
-                        f"→ Acheter {self._format_shares(to_shares)} {to_symbol}"
-                    )
-                ))
-                order_index += 1
+        def add_move(from_symbol, from_shares, to_symbol, to_shares, value):
+            if from_symbol and to_symbol:
+                description = (
+                    f"Vendre {self._format_shares(from_shares)} {from_symbol} "
+                    f"→ Acheter {self._format_shares(to_shares)} {to_symbol}"
+                )
+            elif from_symbol:
+                description = f"Vendre {self._format_shares(from_shares)} {from_symbol}"
             else:
-                # No more deficit, just sell
-                moves.append(SwapMove(
-                    from_symbol=from_symbol,
-                    to_symbol=None,
-                    swap_shares_from=from_shares,
-                    swap_shares_to=None,
-                    swap_value_usd=from_value,
-                    order_index=order_index,
-                    description=f"Vendre {self._format_shares(from_shares)} {from_symbol}"
-                ))
-                order_index += 1
-        
-        # Handle remaining deficit (pure buys)
-        for to_symbol, to_shares, to_value in deficit:
+                description = f"Acheter {self._format_shares(to_shares)} {to_symbol}"
+            
             moves.append(SwapMove(
-                from_symbol=None,
+                from_symbol=from_symbol,
                 to_symbol=to_symbol,
-                swap_shares_from=None,
+                swap_shares_from=from_shares,
                 swap_shares_to=to_shares,
-                swap_value_usd=to_value,
-                order_index=order_index,
-                description=f"Acheter {self._format_shares(to_shares)} {to_symbol}"
+                swap_value_usd=value,
+                order_index=len(moves) + 1,
+                description=description
             ))
-            order_index += 1
+        
+        # Greedy matching on two max-heaps keyed by value: pair the largest
+        # excess with the largest deficit, swap the smaller of the two values
+        # and push the unmatched remainder back so it can fund the next buy.
+        # The sequence number keeps ties in their original order.
+        excess_heap = [(-value, seq, symbol, shares) for seq, (symbol, shares, value) in enumerate(excess)]
+        deficit_heap = [(-value, seq, symbol, shares) for seq, (symbol, shares, value) in enumerate(deficit)]
+        heapq.heapify(excess_heap)
+        heapq.heapify(deficit_heap)
+        seq = len(excess) + len(deficit)
+        
+        while excess_heap and deficit_heap:
+            neg_from_value, _, from_symbol, from_shares = heapq.heappop(excess_heap)
+            neg_to_value, _, to_symbol, to_shares = heapq.heappop(deficit_heap)
+            from_value, to_value = -neg_from_value, -neg_to_value
+            
+            if from_value > to_value:
+                # Only part of the excess is needed for this buy
+                matched_from = self._quantize_shares(from_shares * to_value / from_value)
+                matched_to = to_shares
+            elif to_value > from_value:
+                # The excess only funds part of this buy
+                matched_from = from_shares
+                matched_to = self._quantize_shares(to_shares * from_value / to_value)
+            else:
+                matched_from, matched_to = from_shares, to_shares
+            
+            if matched_from <= 0:
+                # Too small to fund anything: buy outright, keep the excess
+                add_move(None, None, to_symbol, to_shares, to_value)
+                heapq.heappush(excess_heap, (neg_from_value, seq, from_symbol, from_shares))
+                seq += 1
+                continue
+            
+            if matched_to <= 0:
+                # Too small to buy anything: sell outright, keep the deficit
+                add_move(from_symbol, from_shares, None, None, from_value)
+                heapq.heappush(deficit_heap, (neg_to_value, seq, to_symbol, to_shares))
+                seq += 1
+                continue
+            
+            swap_value = min(from_value, to_value)
+            add_move(from_symbol, matched_from, to_symbol, matched_to, swap_value)
+            
+            if from_shares > matched_from:
+                heapq.heappush(excess_heap, (-(from_value - swap_value), seq, from_symbol, from_shares - matched_from))
+                seq += 1
+            if to_shares > matched_to:
+                heapq.heappush(deficit_heap, (-(to_value - swap_value), seq, to_symbol, to_shares - matched_to))
+                seq += 1
+        
+        # No more deficit, just sell
+        while excess_heap:
+            neg_from_value, _, from_symbol, from_shares = heapq.heappop(excess_heap)
+            add_move(from_symbol, from_shares, None, None, -neg_from_value)
+        
+        # Handle remaining deficit (pure buys)
+        while deficit_heap:
+            neg_to_value, _, to_symbol, to_shares = heapq.heappop(deficit_heap)
+            add_move(None, None, to_symbol, to_shares, -neg_to_value)
         
         return moves
@@ -2,7 +2,8 @@
 from decimal import Decimal
 from datetime import datetime
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
 
 from app.models import (
     AlgorithmRun, RecommendedAllocation, OptimizedMoveCashflow,
@@ -71,13 +72,14 @@ def generate_algorithm_run(
         if total_capital == 0:
             raise ValueError("No capital available. Please provide initial capital for the first run.")
     
-    # Get strategy and generate allocations
+    # Get strategy and generate allocations (materialized once, they are
+    # iterated several times below)
     strategy = get_strategy()
-    allocations = strategy.get_allocations(
+    allocations = list(strategy.get_allocations(
         capital_usd=total_capital,
         uninvested_cash=uninvested_cash,
         run_date=datetime.utcnow().date()
-    )
+    ))
     
     # Create algorithm run
     run = AlgorithmRun(
@@ -94,23 +96,27 @@ def generate_algorithm_run(
     db.add(run)
     db.flush()  # Get run.id
     
-    # Save recommended allocations
-    for allocation in allocations:
-        target_amount = total_capital * allocation.percentage
-        rec_allocation = RecommendedAllocation(
-            run_id=run.id,
-            symbol=allocation.symbol,
-            target_percentage=allocation.percentage,
-            target_amount_usd=target_amount
-        )
-        db.add(rec_allocation)
+    # Save recommended allocations (write-only rows: Core executemany INSERT,
+    # no ORM instances)
+    allocation_rows = [
+        {
+            "run_id": run.id,
+            "symbol": allocation.symbol,
+            "target_percentage": allocation.percentage,
+            "target_amount_usd": total_capital * allocation.percentage
+        }
+        for allocation in allocations
+    ]
+    if allocation_rows:
+        db.execute(insert(RecommendedAllocation), allocation_rows)
     
     # Get current prices for all symbols involved
-    all_symbols = set([a.symbol for a in allocations])
+    all_symbols = {a.symbol for a in allocations}
     
     # Get previous positions
     previous_run = (
         db.query(AlgorithmRun)
+        .options(selectinload(AlgorithmRun.actual_positions))
         .filter(AlgorithmRun.status == RunStatus.COMPLETED)
         .filter(AlgorithmRun.id != run.id)
         .order_by(AlgorithmRun.run_date.desc())
@@ -120,7 +126,7 @@ def generate_algorithm_run(
     previous_positions = []
     if previous_run:
         previous_positions = previous_run.actual_positions
-        all_symbols.update([pos.symbol for pos in previous_positions])
+        all_symbols.update(pos.symbol for pos in previous_positions)
     
     # Fetch current prices
     try:
@@ -130,6 +136,13 @@ def generate_algorithm_run(
         print(f"Warning: Failed to fetch prices: {e}")
         current_prices = {}
     
+    # Validate prices once: symbols without a usable quote are left out of the
+    # targets and valued at cost basis on the current side
+    current_prices = {symbol: price for symbol, price in current_prices.items() if price > 0}
+    missing_prices = sorted(all_symbols - current_prices.keys())
+    if missing_prices:
+        print(f"Warning: No price available for {', '.join(missing_prices)}")
+    
     # Calculate optimized moves (cashflow and swaps)
     rebalancing_service = RebalancingService(db)
 
@@ -139,44 +152,60 @@ def generate_algorithm_run(
         total_capital=total_capital
     )
     
+    # Both move calculations start from the same holdings, build them once
+    holdings = rebalancing_service.compute_holdings(
+        previous_positions=previous_positions,
+        target_allocations=allocations,
+        current_prices=current_prices,
+        total_capital=total_capital
+    )
+    
     # Cashflow moves
     cashflow_moves = rebalancing_service.calculate_cashflow_moves(
         previous_positions=previous_positions,
         target_allocations=allocations,
         current_prices=current_prices,
-        total_capital=total_capital
+        total_capital=total_capital,
+        holdings=holdings
     )
     
-    for move in cashflow_moves:
-        cf_move = OptimizedMoveCashflow(
-            run_id=run.id,
-            symbol=move.symbol,
-            action=move.action,
-            suggested_shares=move.suggested_shares,
-            suggested_value_usd=move.suggested_value_usd,
-            order_index=move.order_index
-        )
-        db.add(cf_move)
+    cashflow_rows = [
+        {
+            "run_id": run.id,
+            "symbol": move.symbol,
+            "action": move.action,
+            "suggested_shares": move.suggested_shares,
+            "suggested_value_usd": move.suggested_value_usd,
+            "order_index": move.order_index
+        }
+        for move in cashflow_moves
+    ]
+    if cashflow_rows:
+        db.execute(insert(OptimizedMoveCashflow), cashflow_rows)
     
     # Swap moves
     swap_moves = rebalancing_service.calculate_swap_moves(
         previous_positions=previous_positions,
         target_allocations=allocations,
         current_prices=current_prices,
-        total_capital=total_capital
+        total_capital=total_capital,
+        holdings=holdings
     )
     
-    for move in swap_moves:
-        swap_move = OptimizedMoveSwap(
-            run_id=run.id,
-            from_symbol=move.from_symbol,
-            to_symbol=move.to_symbol,
-            swap_shares_from=move.swap_shares_from,
-            swap_shares_to=move.swap_shares_to,
-            swap_value_usd=move.swap_value_usd,
-            order_index=move.order_index
-        )
-        db.add(swap_move)
+    swap_rows = [
+        {
+            "run_id": run.id,
+            "from_symbol": move.from_symbol,
+            "to_symbol": move.to_symbol,
+            "swap_shares_from": move.swap_shares_from,
+            "swap_shares_to": move.swap_shares_to,
+            "swap_value_usd": move.swap_value_usd,
+            "order_index": move.order_index
+        }
+        for move in swap_moves
+    ]
+    if swap_rows:
+        db.execute(insert(OptimizedMoveSwap), swap_rows)
     
     db.commit()
     db.refresh(run)
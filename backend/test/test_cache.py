@@ -0,0 +1,40 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+
+from app.algo._cache import FileCache
+
+
+class FileCacheCleanupTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = FileCache(tempfile.mkdtemp(), max_age=timedelta(days=31))
+
+    def _age(self, key: str, days: int) -> None:
+        old = time.time() - days * 86400
+        os.utime(self.cache._path(key), (old, old))
+
+    def test_expired_entry_is_removed_on_read(self) -> None:
+        self.cache.set("yf/AAPL", {"close": 1})
+        self._age("yf/AAPL", days=1)
+
+        self.assertIsNone(self.cache.get("yf/AAPL", timedelta(hours=12)))
+        self.assertFalse(self.cache._path("yf/AAPL").exists())
+
+    def test_set_sweeps_entries_older_than_max_age(self) -> None:
+        self.cache.set("yf/OLD", {"close": 1})
+        self._age("yf/OLD", days=40)
+        self.cache.set("yf/KEEP", {"close": 2})
+        self._age("yf/KEEP", days=5)
+        self.cache._last_sweep = 0.0
+
+        self.cache.set("yf/NEW", {"close": 3})
+
+        self.assertFalse(self.cache._path("yf/OLD").exists())
+        self.assertEqual(self.cache.get("yf/KEEP", None), {"close": 2})
+        self.assertEqual(self.cache.get("yf/NEW", None), {"close": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+from decimal import Decimal
+
+from app.algo.strategy import Allocation
+from app.services.rebalancing import RebalancingService
+
+
+class FirstRunSwapMovesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.service = RebalancingService(db=None)
+
+    def test_target_too_small_for_one_share_is_not_bought(self) -> None:
+        allocations = [
+            Allocation(symbol="AAPL", percentage=Decimal("0.99999")),
+            Allocation(symbol="NVR", percentage=Decimal("0.00001")),
+        ]
+        prices = {"AAPL": Decimal("200"), "NVR": Decimal("8000")}
+
+        moves = self.service.calculate_swap_moves([], allocations, prices, Decimal("1000"))
+
+        self.assertEqual([move.to_symbol for move in moves], ["AAPL"])
+        self.assertTrue(all(move.swap_shares_to > 0 for move in moves))
+        self.assertEqual([move.order_index for move in moves], [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,19 @@ import pandas as pd
 import numpy as np
 import warnings
 import requests
+import functools
+import hashlib
+import inspect
+import io
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
 from bs4 import BeautifulSoup
 import openpyxl
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import Font, Alignment
 from datetime import datetime, timedelta
@@ -26,6 +36,59 @@ except locale.Error:
 # Création d'une structure de données pour le retour de la fonction de calcul
 CalculationResult = namedtuple('CalculationResult', ['score', 'details_df'])
 
+# Session HTTP partagée pour le scraping (connexions TCP/TLS réutilisées d'une page à l'autre).
+# yfinance gère sa propre session (curl_cffi) et n'accepte plus de requests.Session.
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
+
+# Dossier du cache disque (listes d'indices, etc.)
+CACHE_DIR = Path.home() / '.cache' / 'momentor'
+
+def disk_cache(ttl, cacheable=None):
+    """
+    Caches a function's result on disk (pickle), keyed by its arguments, for `ttl` (timedelta).
+    Empty results (None, empty dict/DataFrame) are returned but not stored, so a failed call is retried next time.
+    cacheable: optional predicate, results for which it returns False are not stored either.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Clé stable : les arguments par défaut sont explicités avant le hachage
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = hashlib.sha256(repr(sorted(bound.arguments.items())).encode()).hexdigest()[:16]
+            path = CACHE_DIR / f"{func.__name__}_{key}.pkl"
+
+            try:
+                if time.time() - path.stat().st_mtime < ttl.total_seconds():
+                    with path.open('rb') as f:
+                        return pickle.load(f)
+            except Exception:
+                pass # Pas de cache (ou cache illisible) : on recalcule
+
+            result = func(*args, **kwargs)
+            if result is not None and len(result) > 0 and (cacheable is None or cacheable(result)):
+                tmp_path = None
+                try:
+                    # Écriture atomique pour ne jamais lire un fichier à moitié écrit
+                    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+                    with os.fdopen(fd, 'wb') as f:
+                        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(tmp_path, path)
+                except Exception:
+                    # Écriture ratée : on ne laisse pas le fichier temporaire traîner
+                    if tmp_path is not None:
+                        try:
+                            os.unlink(tmp_path)
+                        except OSError:
+                            pass
+            return result
+        return wrapper
+    return decorator
+
 def get_eur_usd_rate():
     """
     Récupère le taux de change EUR/USD actuel (combien de USD pour 1 EUR) via yfinance.
@@ -42,6 +105,7 @@ def get_eur_usd_rate():
         return 1.0
 
 
+@disk_cache(ttl=timedelta(hours=24)) # La composition des indices change au plus quelques fois par mois
 def get_index_constituents(url, table_id=None, table_index=0):
     """
     Scrapes a Wikipedia URL to get a dictionary of {Ticker: Company_Name}.
@@ -55,34 +119,35 @@ def get_index_constituents(url, table_id=None, table_index=0):
     try:
         print(f"🔍 Récupération des tickers/noms depuis {url} (ID: {table_id}, Index: {table_index})...")
         
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        response = requests.get(url, headers=headers)
+        response = HTTP_SESSION.get(url)
         response.raise_for_status()
 
-        df = None
+        # Le HTML n'est analysé qu'une fois : seul le tableau retenu passe ensuite par read_html
+        soup = BeautifulSoup(response.text, 'lxml')
+        table = None
         
         # --- 1. ESSAI PAR ID (Méthode la plus fiable si l'ID est bon) ---
         if table_id:
-            soup = BeautifulSoup(response.text, 'html.parser')
             table = soup.find('table', {'id': table_id})
             
             if table:
-                df = pd.read_html(str(table), header=0, flavor='lxml')[0]
                 print(f"✅ Tableau trouvé via ID '{table_id}'.")
             else:
                 print(f"⚠️ Tableau avec l'ID '{table_id}' non trouvé. Tentative avec l'index.")
         
         # --- 2. ESSAI PAR INDEX (Méthode de repli) ---
-        if df is None:
-            all_tables = pd.read_html(response.text, header=0, flavor='lxml')
+        if table is None:
+            all_tables = soup.find_all('table')
             
             if table_index >= len(all_tables):
                 print(f"❌ Index de table {table_index} invalide. Seulement {len(all_tables)} tables trouvées.")
                 return {}
             
-            df = all_tables[table_index]
+            table = all_tables[table_index]
             print(f"✅ Tableau trouvé via Index '{table_index}'.")
 
+        df = pd.read_html(io.StringIO(str(table)), header=0, flavor='lxml')[0]
+
         # --- 3. EXTRACTION DES TICKERS ET NOMS ---
         
         # Normaliser les noms de colonnes
@@ -126,20 +191,30 @@ def get_last_closed_month_date():
     last_closed_date = first_of_current_month - timedelta(days=1)
     return last_closed_date
 
-def check_spy_market_condition():
+def coerce_ohlcv(df):
+    """
+    Forces the OHLCV columns to float in a single pass. Non-numeric values become NaN.
+    Columns that are already numeric (the usual yfinance output) are left untouched.
+    """
+    columns = [col for col in ['Open', 'High', 'Low', 'Close', 'Volume']
+               if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])]
+    if columns:
+        df[columns] = df[columns].apply(pd.to_numeric, errors='coerce')
+    return df
+
+def check_spy_market_condition(spy_data=None):
     """
     Checks if the SPY ETF's closing price is above its 220-day moving average.
+    spy_data: optional 1-year daily SPY history already downloaded (fetched here otherwise).
     """
     try:
         print("🔍 Étape 2: Vérification de la condition du marché (SPY)...")
-        spy = yf.Ticker("SPY")
-        spy_data = spy.history(period="1y", interval="1d")
+        if spy_data is None:
+            spy = yf.Ticker("SPY")
+            spy_data = spy.history(period="1y", interval="1d")
         
         # --- Conversion en Float pour la robustesse ---
-        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-            if col in spy_data.columns:
-                # Force la conversion en float. Les valeurs non-numériques deviennent NaN.
-                spy_data[col] = pd.to_numeric(spy_data[col], errors='coerce')
+        coerce_ohlcv(spy_data)
         spy_data.dropna(subset=['Close'], inplace=True)
         # -------------------------------------------
         
@@ -163,74 +238,123 @@ def check_spy_market_condition():
         print(f"❌ Erreur lors de la vérification de SPY : {e}")
         return False
 
-def calculate_wilder_atr(df, period=14):
+def wilder_atr_array(high, low, close, period=14):
     """
-    Calculates the Wilder's Average True Range (ATR).
+    Calculates the Wilder's Average True Range (ATR) on NumPy arrays.
+    Same result as pandas' ewm(alpha=1/period, adjust=False) over the true range.
     """
-    df_copy = df.copy()
+    prev_close = np.empty_like(close)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close[:-1]
     
-    df_copy.loc[:, 'high-low'] = df_copy['High'] - df_copy['Low']
-    df_copy.loc[:, 'high-prevclose'] = abs(df_copy['High'] - df_copy['Close'].shift(1))
-    df_copy.loc[:, 'low-prevclose'] = abs(df_copy['Low'] - df_copy['Close'].shift(1))
+    # fmax ignore les NaN : le premier true range vaut simplement high - low
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
     
-    df_copy.loc[:, 'true_range'] = df_copy[['high-low', 'high-prevclose', 'low-prevclose']].max(axis=1)
+    # ATR (Wilder's smoothing), boucle scalaire sur une série courte (quelques dizaines de mois)
+    alpha = 1.0 / period
+    atr = np.empty_like(true_range)
+    if len(atr) == 0:
+        return atr
     
-    # ATR (Wilder's smoothing)
-    df_copy.loc[:, 'atr'] = df_copy['true_range'].ewm(alpha=1/period, adjust=False).mean()
+    atr[0] = true_range[0]
+    for i in range(1, len(true_range)):
+        atr[i] = atr[i - 1] + alpha * (true_range[i] - atr[i - 1])
     
-    return df_copy
+    return atr
 
-def calculate_momentum_vola(ticker, end_date):
+def has_every_ticker(data):
     """
-    Calculates the 'MomentumVola' score for a given ticker, ensuring data is from closed months.
+    True if every ticker of a group_by="ticker" download has at least one close.
+    yfinance returns all-NaN columns for the tickers whose download failed.
     """
     try:
-        # Calculer la date de début explicite (2.5 ans avant la date de fin)
-        start_date = end_date - timedelta(days=913) # 2.5 ans * 365.25 jours
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
+        return bool(data.xs('Close', level=1, axis=1).notna().any().all())
+    except (KeyError, ValueError):
+        return False
 
-        # Étape 1: Récupérer les données journalières avec les dates de début/fin explicites
-        data_daily = yf.Ticker(ticker).history(start=start_date_str, end=end_date_str, interval="1d")
-        
+@disk_cache(ttl=timedelta(days=31), cacheable=has_every_ticker) # Mois clôturés : les données ne changent plus
+def download_closed_history(tickers, start_date_str, end_date_str):
+    """
+    Downloads in one batch the daily history of several tickers over closed months (end date excluded).
+    """
+    return yf.download(list(tickers), start=start_date_str, end=end_date_str, interval="1d",
+                       group_by="ticker", threads=True, progress=False)
+
+def download_recent_history(tickers, start_date_str):
+    """
+    Downloads in one batch the daily history of several tickers from start_date_str up to today.
+    Never cached: the SPY check and the MM220 filter need the latest bars.
+    """
+    return yf.download(list(tickers), start=start_date_str, interval="1d",
+                       group_by="ticker", threads=True, progress=False)
+
+def get_momentum_window(end_date):
+    """
+    Returns the (start, end) date strings of the 2.5-year daily window used for the momentum.
+    """
+    # Calculer la date de début explicite (2.5 ans avant la date de fin)
+    start_date = end_date - timedelta(days=913) # 2.5 ans * 365.25 jours
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+def calculate_momentum_vola_from_df(data_daily):
+    """
+    Calculates the 'MomentumVola' score from already downloaded daily data (closed months only).
+    """
+    try:
         # --- CORRECTION DE L'ERREUR NUMÉRIQUE ---
-        for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-            if col in data_daily.columns:
-                # Force la conversion en float. Les valeurs non-numériques deviennent NaN.
-                data_daily[col] = pd.to_numeric(data_daily[col], errors='coerce') 
+        coerce_ohlcv(data_daily)
                 
         # Supprime les jours où les données de prix ne sont pas valides (NaN)
         data_daily.dropna(subset=['Close', 'High', 'Low'], inplace=True)
         # ----------------------------------------
         
-        # Étape 2: Rééchantillonner pour obtenir la clôture du dernier jour de trading du mois
-        data_mo = data_daily.resample('M').last().dropna()
+        # Étape 2: Regrouper par mois calendaire pour obtenir la clôture du dernier jour de trading du mois
+        # (simple groupby sur une clé entière année*12+mois, sans grille mensuelle de resample ;
+        # chaque mois est daté de sa dernière séance)
+        month_keys = data_daily.index.year * 12 + data_daily.index.month
+        data_mo = data_daily.groupby(month_keys).last()
+        data_mo.index = data_daily.index[~month_keys.duplicated(keep='last')]
+        data_mo = data_mo.dropna()
         
         if len(data_mo) < 8: 
             return CalculationResult(score=None, details_df=None)
         
-        # Calcul du momentum (moyenne des rendements des 3 derniers mois)
-        data_mo.loc[:, 'monthly_return'] = data_mo['Close'].pct_change()
-        momentum = data_mo['monthly_return'].iloc[-3:].mean()
+        # Calcul du momentum (moyenne des rendements des 3 derniers mois) : seules les
+        # 4 dernières clôtures mensuelles sont utiles, inutile de calculer toute la série
+        monthly_closes = data_mo['Close'].to_numpy(dtype=float)
+        momentum = np.mean(monthly_closes[-3:] / monthly_closes[-4:-1] - 1.0)
         
-        # Calcul de l'ATR de Wilder (period=8 mois)
-        data_mo_with_atr = calculate_wilder_atr(data_mo, period=8)
+        # Calcul de l'ATR de Wilder (period=8 mois), directement sur les tableaux NumPy :
+        # data_mo est déjà un nouveau DataFrame, la colonne est ajoutée sans copie
+        data_mo.loc[:, 'atr'] = wilder_atr_array(
+            data_mo['High'].to_numpy(dtype=float),
+            data_mo['Low'].to_numpy(dtype=float),
+            data_mo['Close'].to_numpy(dtype=float),
+            period=8
+        )
         
         # Volatilité (Moyenne des 8 derniers ATR)
-        df_vol_period = data_mo_with_atr.iloc[-8:]
-        volatility = df_vol_period['atr'].mean()
+        volatility = data_mo['atr'].iloc[-8:].mean()
         
         if volatility == 0:
             score = 0
         else:
             score = momentum / volatility
         
-        return CalculationResult(score=score, details_df=data_mo_with_atr)
+        return CalculationResult(score=score, details_df=data_mo)
     except Exception as e:
         # Afficher l'erreur pour le diagnostic
         # print(f"Erreur lors du calcul pour {ticker}: {e}") # Désactivé pour ne pas surcharger la console
         return CalculationResult(score=None, details_df=None)
 
+def append_dataframe(worksheet, df, index):
+    """
+    Appends a DataFrame (header included) below the last written row, after one empty row.
+    """
+    worksheet.append([])
+    for row in dataframe_to_rows(df, index=index, header=True):
+        worksheet.append(row)
+
 def format_aapl_details_sheet(writer, aapl_details_df, last_closed_date):
     """
     Creates a dedicated sheet for AAPL calculation details in the Excel file.
@@ -245,6 +369,8 @@ def format_aapl_details_sheet(writer, aapl_details_df, last_closed_date):
     
     # Nettoyage de l'heure du timestamp (laisse la date)
     aapl_details_df.index = aapl_details_df.index.tz_localize(None)
+    # Libellés "Mois Année" des 8 derniers mois, formatés une seule fois pour les deux tableaux
+    month_labels = aapl_details_df.index[-8:].strftime('%B %Y').str.capitalize()
     last_closed_date_formatted = last_closed_date.strftime('%d %B %Y').capitalize()
 
     # Titre de la feuille
@@ -260,20 +386,17 @@ def format_aapl_details_sheet(writer, aapl_details_df, last_closed_date):
     worksheet[f'A{row_start}'] = "Calcul du Momentum (Moyenne des 3 derniers rendements mensuels)"
     worksheet[f'A{row_start}'].font = Font(bold=True)
     
-    momentum_df = aapl_details_df[['monthly_return']].iloc[-3:].copy()
-    momentum_df.index = momentum_df.index.strftime('%B %Y').str.capitalize() # Format mois année
-    momentum_df.index.name = 'Mois Clôturé'
+    # Les 3 derniers rendements mensuels, calculés directement sur les 4 dernières clôtures
+    monthly_closes = aapl_details_df['Close'].to_numpy(dtype=float)
+    monthly_returns = monthly_closes[-3:] / monthly_closes[-4:-1] - 1.0
     
-    momentum_df.rename(columns={'monthly_return': 'Rendement Mensuel'}, inplace=True)
+    momentum_df = pd.DataFrame({'Rendement Mensuel': monthly_returns}, index=month_labels[-3:]) # Format mois année
+    momentum_df.index.name = 'Mois Clôturé'
     
-    rows = dataframe_to_rows(momentum_df, index=True, header=True)
-    for r_idx, row in enumerate(rows, row_start + 2):
-        for c_idx, value in enumerate(row, 1):
-            worksheet.cell(row=r_idx, column=c_idx, value=value)
+    append_dataframe(worksheet, momentum_df, index=True)
     
-    momentum_result_row = worksheet.max_row + 1
-    worksheet.cell(row=momentum_result_row, column=1, value="Moyenne des rendements :")
-    worksheet.cell(row=momentum_result_row, column=2, value=momentum_df['Rendement Mensuel'].mean()).number_format = '0.000%'
+    worksheet.append(["Moyenne des rendements :", momentum_df['Rendement Mensuel'].mean()])
+    worksheet.cell(row=worksheet.max_row, column=2).number_format = '0.000%'
 
     # --- Tableau de la Volatilité (ATR) ---
 
@@ -282,18 +405,14 @@ def format_aapl_details_sheet(writer, aapl_details_df, last_closed_date):
     worksheet[f'A{row_start}'].font = Font(bold=True)
 
     atr_df = aapl_details_df[['atr']].iloc[-8:].copy()
-    atr_df.index = atr_df.index.strftime('%B %Y').str.capitalize()
+    atr_df.index = month_labels
     atr_df.index.name = 'Mois Clôturé'
     atr_df.rename(columns={'atr': 'ATR'}, inplace=True)
 
-    rows = dataframe_to_rows(atr_df, index=True, header=True)
-    for r_idx, row in enumerate(rows, row_start + 2):
-        for c_idx, value in enumerate(row, 1):
-            worksheet.cell(row=r_idx, column=c_idx, value=value)
+    append_dataframe(worksheet, atr_df, index=True)
     
-    atr_result_row = worksheet.max_row + 1
-    worksheet.cell(row=atr_result_row, column=1, value="Moyenne des ATR :")
-    worksheet.cell(row=atr_result_row, column=2, value=atr_df['ATR'].mean()).number_format = '0.00'
+    worksheet.append(["Moyenne des ATR :", atr_df['ATR'].mean()])
+    worksheet.cell(row=worksheet.max_row, column=2).number_format = '0.00'
 
     # --- Tableau récapitulatif ---
     
@@ -301,7 +420,7 @@ def format_aapl_details_sheet(writer, aapl_details_df, last_closed_date):
     worksheet[f'A{row_start}'] = "Récapitulatif et Score Final"
     worksheet[f'A{row_start}'].font = Font(bold=True)
     
-    momentum_value = aapl_details_df['monthly_return'].iloc[-3:].mean()
+    momentum_value = np.mean(monthly_returns)
     volatility_value = aapl_details_df['atr'].iloc[-8:].mean()
 
     if volatility_value == 0:
@@ -319,15 +438,13 @@ def format_aapl_details_sheet(writer, aapl_details_df, last_closed_date):
     }
     summary_df = pd.DataFrame(summary_data)
     
-    rows = dataframe_to_rows(summary_df, index=False, header=True)
-    for r_idx, row in enumerate(rows, row_start + 2):
-        for c_idx, value in enumerate(row, 1):
-            worksheet.cell(row=r_idx, column=c_idx, value=value)
+    append_dataframe(worksheet, summary_df, index=False)
     
     # Formatage des nombres
-    worksheet['B' + str(worksheet.max_row-1)].number_format = '0.000%'
-    worksheet['B' + str(worksheet.max_row)].number_format = '0.00'
-    worksheet['B' + str(worksheet.max_row+1)].number_format = '0.00'
+    last_row = worksheet.max_row
+    worksheet['B' + str(last_row-1)].number_format = '0.000%'
+    worksheet['B' + str(last_row)].number_format = '0.00'
+    worksheet['B' + str(last_row+1)].number_format = '0.00'
     
 def format_portfolio_sheet(writer, df_portfolio, last_closed_date):
     """
@@ -425,9 +542,12 @@ def main(montant_total, base_currency_choice):
     sp500_url = 'https://en.wikipedia.org/wiki/List_of_S&P_500_companies'
     nasdaq100_url = 'https://en.wikipedia.org/wiki/Nasdaq-100'
     
-    # Récupérer les maps {Ticker: Nom}
-    sp500_map = get_index_constituents(sp500_url, table_id="constituents") # table_index=1)
-    nasdaq100_map = get_index_constituents(nasdaq100_url, table_id="constituents")
+    # Récupérer les maps {Ticker: Nom} (les deux pages sont téléchargées en parallèle)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        sp500_future = executor.submit(get_index_constituents, sp500_url, table_id="constituents") # table_index=1)
+        nasdaq100_future = executor.submit(get_index_constituents, nasdaq100_url, table_id="constituents")
+        sp500_map = sp500_future.result()
+        nasdaq100_map = nasdaq100_future.result()
     
     # Fusionner les tickers et noms dans une seule carte pour référence
     ticker_to_name_map = sp500_map.copy()
@@ -436,15 +556,17 @@ def main(montant_total, base_currency_choice):
     sp500_tickers = set(sp500_map.keys())
     nasdaq100_tickers = set(nasdaq100_map.keys())
 
-    common_tickers = sp500_tickers.intersection(nasdaq100_tickers)
+    common_set = sp500_tickers & nasdaq100_tickers
     
-    if 'GOOGL' in common_tickers:
-        common_tickers.remove('GOOGL')
+    if 'GOOGL' in common_set:
         # S'assurer que GOOGL est retiré de la carte aussi (bien qu'il ne devrait pas être dans les tops 4)
-        if 'GOOGL' in ticker_to_name_map: del ticker_to_name_map['GOOGL']
+        ticker_to_name_map.pop('GOOGL', None)
         print("➡️ L'action GOOGL a été exclue de la liste des actions communes.")
 
-    df_common = pd.DataFrame(sorted(list(common_tickers)), columns=['Ticker'])
+    # Tuple trié une fois pour toutes : ordre stable pour le téléchargement, les clés de cache et les calculs
+    common_tickers = tuple(sorted(common_set - {'GOOGL'}))
+
+    df_common = pd.DataFrame(list(common_tickers), columns=['Ticker'])
 
     if not common_tickers:
         print("❌ Aucune action commune trouvée. Le script s'arrête.")
@@ -452,29 +574,49 @@ def main(montant_total, base_currency_choice):
 
     print(f"✅ {len(common_tickers)} actions communes entre le S&P 500 et le NASDAQ-100 trouvées.")
     
+    # Téléchargements groupés pour SPY et toutes les actions (yfinance parallélise les requêtes) :
+    # les mois clôturés de la fenêtre de momentum (2,5 ans) viennent du cache disque, seul le mois
+    # en cours est retéléchargé à chaque exécution pour que SPY et la MM220 voient les dernières séances
+    start_date_str, end_date_str = get_momentum_window(last_closed_date)
+    bulk_tickers = tuple(sorted({*common_tickers, 'SPY'}))
+    closed_history = download_closed_history(bulk_tickers, start_date_str, end_date_str)
+    recent_history = download_recent_history(bulk_tickers, end_date_str)
+    frames = [frame for frame in (closed_history, recent_history) if not frame.empty]
+    if not frames:
+        print("❌ Impossible de télécharger l'historique des cours. Le script s'arrête.")
+        return
+    bulk = pd.concat(frames)
+    bulk_dates = bulk.index.tz_localize(None) if getattr(bulk.index, 'tz', None) is not None else bulk.index
+    
+    # Dernière année pour SPY et la MM220
+    bulk_1y = bulk[bulk_dates > pd.Timestamp(datetime.now().date() - timedelta(days=365))]
+    
     # 3. VÉRIFICATION DE LA CONDITION DU MARCHÉ
-    if not check_spy_market_condition():
+    spy_data = bulk_1y['SPY'].dropna(how='all') if 'SPY' in bulk_1y.columns.get_level_values(0) else None
+    if not check_spy_market_condition(spy_data):
         return
         
     # 4. FILTRAGE DES ACTIONS PAR MM220
     print("\n🔍 Étape 3: Filtrage des actions...")
     filtered_stocks = []
     # La condition de la moyenne mobile utilise les données journalières à la date actuelle
-    for ticker in common_tickers:
-        try:
-            data = yf.Ticker(ticker).history(period="1y", interval="1d")
-            
-            for col in ['Close']:
-                if col in data.columns:
-                    data[col] = pd.to_numeric(data[col], errors='coerce')
-            data.dropna(subset=['Close'], inplace=True)
-            
-            if len(data) >= 220:
-                data['SMA_220'] = data['Close'].rolling(window=220).mean()
-                if data['Close'].iloc[-1] > data['SMA_220'].iloc[-1]:
-                    filtered_stocks.append(ticker)
-        except Exception:
-            pass
+    try:
+        # Matrice (dates x actions) des clôtures, convertie en float en une seule fois
+        closes = bulk_1y.xs('Close', level=1, axis=1).reindex(columns=list(common_tickers))
+        closes = closes.apply(pd.to_numeric, errors='coerce')
+        
+        # Ramener les clôtures valides de chaque action en bas de sa colonne, comme le ferait
+        # un dropna par action : les 220 dernières lignes sont alors les 220 dernières clôtures
+        order = np.argsort(closes.notna().to_numpy(), axis=0, kind='stable')
+        packed = np.take_along_axis(closes.to_numpy(dtype=float), order, axis=0)
+        
+        # Seule la dernière valeur de la MM220 est utile : moyenne des 220 dernières lignes,
+        # sans série glissante (NaN si moins de 220 clôtures -> action exclue)
+        if len(packed) >= 220:
+            sma_220 = packed[-220:].mean(axis=0)
+            filtered_stocks = closes.columns[packed[-1] > sma_220].tolist()
+    except Exception:
+        pass
     
     if not filtered_stocks:
         print("❌ Aucune action ne respecte la condition de la moyenne mobile. Le script s'arrête.")
@@ -487,8 +629,15 @@ def main(montant_total, base_currency_choice):
     scores = {}
     aapl_details_df = None
 
+    # Fenêtre de 2,5 ans arrêtée au dernier mois clôturé (date de fin exclue, comme pour yfinance)
+    bulk_momentum = bulk[bulk_dates < pd.Timestamp(end_date_str)]
+
     for ticker in filtered_stocks:
-        result = calculate_momentum_vola(ticker, end_date=last_closed_date)
+        try:
+            data_daily = bulk_momentum[ticker].dropna(how='all')
+        except KeyError:
+            continue
+        result = calculate_momentum_vola_from_df(data_daily)
         if result.score is not None:
             scores[ticker] = result.score
             if ticker == 'AAPL':
@@ -514,30 +663,30 @@ def main(montant_total, base_currency_choice):
     allocation_variable_total = montant_total * 0.70
     allocation_per_stock = allocation_variable_total / len(top_4_tickers) if top_4_tickers else 0
     
-    portfolio_data_raw = [] # Utilisé pour stocker les montants en tant que nombres
-
+    # Les montants sont stockés en tant que nombres (formatés plus bas pour l'affichage)
+    
     # --- POSITION ETF ---
-    portfolio_data_raw.append({
+    etf_row = pd.DataFrame([{
         'Nom de la position': 'Vanguard S&P 500 UCITS ETF',
         'Ticker': 'IE00B5BMR087', 
         'Score MomemtumVola': 'N/A',
         'Montant_Base': allocation_fixed,
         'Allocation %': 30
-    })
+    }])
     # --- POSITIONS ACTIONS ---
-    for ticker in top_4_tickers:
-        # Utiliser la carte de noms pour trouver le nom de la société, sinon afficher le ticker
-        company_name = ticker_to_name_map.get(ticker, f"Action ({ticker})") 
-        
-        portfolio_data_raw.append({
-            'Nom de la position': company_name, # Mise à jour : Utilisation du nom réel
-            'Ticker': ticker,
-            'Score MomemtumVola': scores.get(ticker, 'N/A'),
-            'Montant_Base': allocation_per_stock,
-            'Allocation %': 70 / len(top_4_tickers)
-        })
+    # Noms réels des sociétés en un seul reindex, sinon afficher le ticker
+    company_names = pd.Series(ticker_to_name_map, dtype=object).reindex(top_4_tickers)
+    company_names = company_names.fillna(pd.Series([f"Action ({t})" for t in top_4_tickers], index=top_4_tickers))
+    
+    stock_rows = pd.DataFrame({
+        'Nom de la position': company_names.to_numpy(),
+        'Ticker': top_4_tickers,
+        'Score MomemtumVola': pd.Series(scores).reindex(top_4_tickers).to_numpy(),
+        'Montant_Base': allocation_per_stock,
+        'Allocation %': 70 / len(top_4_tickers)
+    })
         
-    df_portfolio = pd.DataFrame(portfolio_data_raw)
+    df_portfolio = pd.concat([etf_row, stock_rows], ignore_index=True)
     
     # --- CALCUL DE LA CONVERSION ET RENOMMAGE DES COLONNES ---
     df_portfolio['Montant_Converti'] = df_portfolio['Montant_Base'] * conversion_rate